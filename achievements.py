@@ -0,0 +1,68 @@
+"""Declarative achievement rules, evaluated only for the learning events they subscribe to."""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable
+
+# Learning events
+CARD_RATED = "card_rated"
+QUIZ_ANSWERED = "quiz_answered"
+QUIZ_COMPLETED = "quiz_completed"
+MEMORY_COMPLETED = "memory_completed"
+PROGRESS_CHANGED = "progress_changed"
+
+
+@dataclass(frozen=True)
+class Rule:
+    title: str
+    description: str  # str.format template, filled from the event context
+    events: frozenset
+    condition: Callable[[dict], bool]
+
+
+def rule(title, description, *events, when):
+    return Rule(title, description, frozenset(events), when)
+
+
+RULES = (
+    rule("Erste Schritte", "25% Fortschritt erreicht!", PROGRESS_CHANGED,
+         when=lambda c: 25 <= c["progress"] < 50),
+    rule("Halbzeit", "50% Fortschritt erreicht!", PROGRESS_CHANGED,
+         when=lambda c: 50 <= c["progress"] < 75),
+    rule("Fast geschafft", "75% Fortschritt erreicht!", PROGRESS_CHANGED,
+         when=lambda c: 75 <= c["progress"] < 100),
+    rule("Themen-Meister", "{deck} zu 100% abgeschlossen!", PROGRESS_CHANGED,
+         when=lambda c: c["progress"] >= 100),
+    rule("Kartei-Meister", "Alle Karteikarten durchgearbeitet!", CARD_RATED,
+         when=lambda c: c["studied"] == c["total"]),
+    rule("Quiz-Talent", "Erste richtige Antwort!", QUIZ_ANSWERED,
+         when=lambda c: c["correct"]),
+    rule("Perfektionist", "100% im Quiz erreicht!", QUIZ_COMPLETED,
+         when=lambda c: c["percentage"] == 100),
+    rule("Quiz-Experte", "Über 80% im Quiz erreicht!", QUIZ_COMPLETED,
+         when=lambda c: 80 <= c["percentage"] < 100),
+    rule("Memory-Meister", "Alle Paare in {moves} Zügen gefunden!", MEMORY_COMPLETED,
+         when=lambda c: True),
+)
+
+# Earlier titles, so learners who unlocked one are not awarded it again under its new name
+RENAMED = {"Meister der Somatoformen Störungen": "Themen-Meister"}
+
+
+class AchievementEngine:
+    """Indexes rules by event, so an event only looks at the rules that listen to it."""
+
+    def __init__(self, rules=RULES):
+        self.rules = tuple(rules)
+        by_event = defaultdict(list)
+        for r in self.rules:
+            for event in r.events:
+                by_event[event].append(r)
+        self._by_event = {event: tuple(rules) for event, rules in by_event.items()}
+
+    def evaluate(self, event, unlocked, **context):
+        # Returns (title, description) for every rule this event newly satisfies
+        return [
+            (r.title, r.description.format(**context))
+            for r in self._by_event.get(event, ())
+            if r.title not in unlocked and r.condition(context)
+        ]
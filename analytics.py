@@ -0,0 +1,201 @@
+"""Learning analytics over the event log, aggregated incrementally with pandas."""
+import copy
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from progress_store import well_formed
+from scheduler import AGAIN, DAY
+
+CHUNK_SIZE = 50_000  # events aggregated per DataFrame
+IDLE_GAP = 5 * 60  # a longer pause between two events is a break, not study time (untracked history)
+INTERVAL_BINS = (0, 1 / 24, 1, 3, 7, 14, 30, np.inf)  # days since the card's previous review
+INTERVAL_LABELS = ("< 1 Std.", "< 1 Tag", "1–3 Tage", "3–7 Tage", "1–2 Wochen", "2–4 Wochen", "> 4 Wochen")
+DAILY_COLUMNS = ("reviews", "new_cards", "answers", "correct", "seconds", "tracked_seconds")
+
+# Calendar days in the server's local time, like the timestamps in the exports
+LOCAL_TZ = datetime.now().astimezone().tzinfo
+
+
+def _days(ts):
+    return pd.to_datetime(ts, unit="s", utc=True).tz_convert(LOCAL_TZ).tz_localize(None).normalize()
+
+
+def _add(total, new):
+    # Running sums: new groups are appended, known ones added up
+    return new if total is None else total.add(new, fill_value=0)
+
+
+class LearningAnalytics:
+    """Running aggregates of one user's event log.
+
+    Only counts are kept: reviews and recalls per card and interval bin,
+    answers and errors per quiz question, views and active time per item
+    from the time tracker's ``dwell`` events, and one row of totals per day,
+    plus the last review time of every card and the last event's time to
+    carry intervals and study time across chunks. ``update`` reads just
+    the events after ``last_id`` and adds their group-bys to these, so a
+    view costs as much as the history that is new since the last one.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.last_id = 0
+        self._lock = threading.Lock()
+        self._last_ts = None
+        self._last_review = pd.Series(dtype=np.float64)  # card -> ts
+        self._retention = None  # (card, interval) -> reviews, recalled
+        self._questions = None  # (source, question) -> answered, wrong
+        self._dwell = None  # (kind, item) -> views, active, idle
+        self._daily = None  # day -> DAILY_COLUMNS
+
+    def update(self, store, chunk_size=CHUNK_SIZE, until_id=None):
+        with self._lock:
+            while True:
+                rows = store.events(self.user_id, self.last_id, limit=chunk_size, until_id=until_id)
+                if rows:
+                    self._aggregate(rows)
+                    self.last_id = rows[-1][0]
+                if len(rows) < chunk_size:
+                    return self
+
+    def including(self, rows):
+        """A copy with ``rows`` added, e.g. events not written yet; this one is left as it was."""
+        with self._lock:
+            # _aggregate replaces the aggregates rather than changing them, so a shallow copy will do
+            stats = copy.copy(self)
+        stats._lock = threading.Lock()
+        if rows:
+            stats._aggregate(rows)
+        return stats
+
+    def _aggregate(self, rows):
+        _, ts, kinds, payloads = zip(*rows)
+        ts = np.array(ts)
+        kinds = np.array(kinds)
+        days = _days(ts)
+
+        # Study time: gaps between consecutive events, up to IDLE_GAP each
+        gaps = np.diff(ts, prepend=ts[0] if self._last_ts is None else self._last_ts)
+        gaps[(gaps > IDLE_GAP) | (gaps < 0)] = 0
+        self._last_ts = ts[-1]
+        daily = [pd.Series(gaps, index=days).groupby(level=0).sum().rename("seconds")]
+
+        # Malformed events (e.g. from a broken offline client) are left out, not fatal
+        valid = np.array([well_formed(kind, payload) for kind, payload in zip(kinds, payloads)], dtype=bool)
+        rated = np.flatnonzero((kinds == "card_rated") & valid)
+        if len(rated):
+            reviews = pd.DataFrame({
+                "card": [payloads[i]["card"] for i in rated],
+                "rating": [payloads[i]["rating"] for i in rated],
+                "ts": ts[rated],
+                "day": days[rated],
+            })
+            # Interval since the card's previous review, which may lie in an earlier chunk
+            previous = reviews.groupby("card")["ts"].shift()
+            previous = previous.fillna(reviews["card"].map(self._last_review))
+            reviews["interval"] = pd.cut((reviews["ts"] - previous) / DAY, INTERVAL_BINS,
+                                         labels=INTERVAL_LABELS, right=False)
+            reviews["recalled"] = reviews["rating"] != AGAIN
+            self._retention = _add(self._retention, reviews.dropna(subset=["interval"]).groupby(
+                ["card", "interval"], observed=True
+            )["recalled"].agg(reviews="size", recalled="sum"))
+
+            first = reviews.drop_duplicates("card")
+            first = first[~first["card"].isin(self._last_review.index)]
+            daily.append(first.groupby("day").size().rename("new_cards"))
+            daily.append(reviews.groupby("day").size().rename("reviews"))
+            last = reviews.groupby("card")["ts"].last()
+            self._last_review = last.combine_first(self._last_review)
+
+        answered = np.flatnonzero((kinds == "quiz_answered") & valid)
+        if len(answered):
+            answers = pd.DataFrame({
+                "source": [payloads[i].get("source", "deck") for i in answered],
+                "question": [payloads[i]["question"] for i in answered],
+                "correct": [bool(payloads[i]["correct"]) for i in answered],
+                "day": days[answered],
+            })
+            answers["wrong"] = ~answers["correct"]
+            self._questions = _add(self._questions, answers.groupby(["source", "question"]).agg(
+                answered=("wrong", "size"), wrong=("wrong", "sum")
+            ))
+            per_day = answers.groupby("day")["correct"].agg(answers="size", correct="sum")
+            daily.extend((per_day["answers"], per_day["correct"]))
+
+        dwell = np.flatnonzero(kinds == "dwell")
+        if len(dwell):
+            items = pd.DataFrame(
+                [(days[i], *item) for i in dwell for item in payloads[i]["items"]],
+                columns=("day", "kind", "item", "active", "idle"),
+            )
+            daily.append(items.groupby("day")["active"].sum().rename("tracked_seconds"))
+            # Mode-level time (Mindmap, Memory, ...) has no item; -1 keeps it in the integer index
+            items["item"] = items["item"].fillna(-1).astype(np.int64)
+            self._dwell = _add(self._dwell, items.groupby(["kind", "item"]).agg(
+                views=("active", "size"), active=("active", "sum"), idle=("idle", "sum")
+            ))
+
+        self._daily = _add(self._daily, pd.concat(daily, axis=1).reindex(columns=DAILY_COLUMNS).fillna(0))
+
+    @property
+    def empty(self):
+        return self._daily is None
+
+    def daily(self):
+        """One row per calendar day since the first event, quiet days included."""
+        if self._daily is None:
+            return pd.DataFrame(columns=(*DAILY_COLUMNS, "minutes", "cards_total", "accuracy"))
+        daily = self._daily.sort_index()
+        daily = daily.reindex(pd.date_range(daily.index[0], daily.index[-1], freq="D"), fill_value=0)
+        # Days with time tracker measurements use them; earlier ones fall back to the event gaps
+        daily["minutes"] = daily["tracked_seconds"].where(daily["tracked_seconds"] > 0, daily["seconds"]) / 60
+        daily["cards_total"] = daily["new_cards"].cumsum()
+        daily["accuracy"] = (daily["correct"] / daily["answers"].where(daily["answers"] > 0)) * 100
+        return daily
+
+    def retention_curve(self, card=None):
+        """Share of reviews recalled per interval since the previous review, for one card or all."""
+        if self._retention is None:
+            counts = pd.DataFrame({"reviews": 0, "recalled": 0}, index=pd.Index(INTERVAL_LABELS))
+        elif card is None:
+            counts = self._retention.groupby(level="interval", observed=False).sum()
+        else:
+            counts = self._retention.xs(card, level="card") if card in self._retention.index.levels[0] \
+                else self._retention.iloc[:0].droplevel("card")
+        counts = counts.reindex(INTERVAL_LABELS, fill_value=0)
+        counts["rate"] = counts["recalled"] / counts["reviews"].where(counts["reviews"] > 0) * 100
+        return counts
+
+    def reviewed_cards(self, limit=None):
+        """Cards with at least one repeated review, most reviews first."""
+        if self._retention is None:
+            return []
+        totals = self._retention.groupby(level="card")["reviews"].sum()
+        return totals.sort_values(ascending=False, kind="stable").index[:limit].tolist()
+
+    def question_errors(self, limit=None):
+        """Answers, errors and error rate per quiz question, highest error rate first."""
+        if self._questions is None:
+            return pd.DataFrame(columns=("source", "question", "answered", "wrong", "error_rate"))
+        questions = self._questions.reset_index()
+        questions["error_rate"] = questions["wrong"] / questions["answered"] * 100
+        questions = questions.sort_values(["error_rate", "answered"], ascending=False, kind="stable")
+        return questions.head(limit) if limit else questions
+
+    def time_by_kind(self):
+        """Tracked active seconds per kind of item (card, quiz, memory, ...), largest first."""
+        if self._dwell is None:
+            return pd.Series(dtype=np.float64)
+        return self._dwell.groupby(level="kind")["active"].sum().sort_values(ascending=False)
+
+    def slowest_items(self, kind, limit=None):
+        """Items of one kind by mean active time per view, longest first."""
+        if self._dwell is None or kind not in self._dwell.index.levels[0]:
+            return pd.DataFrame(columns=("item", "views", "active", "idle", "mean_active"))
+        items = self._dwell.xs(kind, level="kind").drop(index=-1, errors="ignore").reset_index()
+        items["mean_active"] = items["active"] / items["views"]
+        items = items.sort_values("mean_active", ascending=False, kind="stable")
+        return items.head(limit) if limit else items
@@ -0,0 +1,246 @@
+"""Rerun-latency benchmark for every learning mode, driven by Streamlit's headless AppTest.
+
+Example::
+
+    python benchmarks/bench_modes.py --cards 100 10000 --iterations 30
+    python benchmarks/bench_modes.py --modes karteikarten quiz --max-p95-ms 150
+
+Every interaction is one ``AppTest.run()``, i.e. a full script run; the
+browser would only rerun the fragment of the active mode, so these numbers
+are an upper bound. Memory card clicks are the exception: they rerun only
+the cards they changed, in AppTest as in the browser. Peak memory is measured in a second, shorter pass under
+tracemalloc, so it does not distort the timings. The session column is
+the pickled size of the session state after the timed pass.
+
+Replaying a Memory click needs AppTest internals (``_tree`` for the widget
+states of the page, ``_run`` to send them), as the public API can only
+click widgets of the last run's element tree. They are used in
+``_widget_states`` and ``_run_with`` only, and the Streamlit versions they
+are known to work with are pinned in ``benchmarks/requirements.txt``.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import streamlit
+from streamlit.proto.WidgetStates_pb2 import WidgetStates
+from streamlit.testing.v1 import AppTest
+
+from synthetic_deck import make_deck
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from session_size import state_sizes  # noqa: E402
+
+APP = Path(__file__).resolve().parent.parent / "lernen.py"
+TESTED_STREAMLIT = "1.65."  # keep in step with benchmarks/requirements.txt
+MODE_LABELS = {
+    "karteikarten": "📇 Karteikarten",
+    "mindmap": "🕸️ Mindmap",
+    "quiz": "❓ Quiz",
+    "memory": "🎮 Memory-Spiel",
+    "statistiken": "📈 Statistiken",
+}
+
+
+def _widget_states(at):
+    return at._tree.get_widget_states()
+
+
+def _run_with(at, states):
+    return at._run(states)
+
+
+def _check_apptest():
+    if not hasattr(AppTest, "_run"):
+        raise SystemExit(f"AppTest of Streamlit {streamlit.__version__} lacks _run; "
+                         "install benchmarks/requirements.txt")
+    if not streamlit.__version__.startswith(TESTED_STREAMLIT):
+        print(f"Warning: the Memory scenario is tested with Streamlit {TESTED_STREAMLIT}x, "
+              f"not {streamlit.__version__}", file=sys.stderr)
+
+
+def _button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def _finish_quiz(at):
+    at.sidebar.radio[0].set_value(MODE_LABELS["quiz"]).run()
+    while not at.session_state.quiz_completed:
+        at.button(key="opt_0").click().run()
+        _button(at, "Nächste Frage ➡️").click().run()
+
+
+def _open(mode):
+    at = AppTest.from_file(str(APP), default_timeout=120)
+    at.run()
+    if mode == "statistiken":
+        # With a finished quiz, so the page also shows the quiz result and its tips
+        _finish_quiz(at)
+    if mode != "karteikarten":
+        at.sidebar.radio[0].set_value(MODE_LABELS[mode]).run()
+    return at
+
+
+# Each scenario yields once per interaction, after arranging the widget state
+# for the next run (or together with the widget states to send); the caller
+# times the run itself.
+def karteikarten(at):
+    while True:
+        _button(at, "🔄 Karte umdrehen").click()
+        yield "flip"
+        _button(at, "🙂 Gut").click()
+        yield "rate"
+
+
+def quiz(at):
+    while True:
+        if at.session_state.quiz_completed:
+            _button(at, "Quiz wiederholen 🔄").click()
+            yield "restart"
+            continue
+        at.button(key="opt_0").click()
+        yield "answer"
+        _button(at, "Nächste Frage ➡️").click()
+        yield "next"
+
+
+def _memory_click(page, button_id):
+    # Like the browser: the page's other widgets as last rendered, plus this one button's click
+    states = WidgetStates()
+    states.widgets.extend(w for w in page.widgets if w.WhichOneof("value") != "trigger_value")
+    click = states.widgets.add()
+    click.id = button_id
+    click.trigger_value = True
+    return states
+
+
+def memory(at):
+    # A card click reruns only the changed cards, so afterwards the element tree holds just
+    # those; the cards still closed are looked up in the session state instead
+    while True:
+        page = _widget_states(at)
+        buttons = {b.key: b.id for b in at.button if b.key}
+        restart = _button(at, "Neu starten 🔄").id
+        while True:
+            state = at.session_state
+            closed = [
+                int(key[4:]) for key in buttons
+                if key.startswith("mem_") and not state.memory_matched >> int(key[4:]) & 1
+                and int(key[4:]) not in state.memory_open
+            ]
+            if not closed:
+                yield "restart", _memory_click(page, restart)
+                break
+            yield "flip", _memory_click(page, buttons[f"mem_{closed[0]}"])
+
+
+def rerun(at):
+    while True:
+        yield "render"
+
+
+SCENARIOS = {
+    "karteikarten": karteikarten,
+    "mindmap": rerun,
+    "quiz": quiz,
+    "memory": memory,
+    "statistiken": rerun,
+}
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        value = samples[0] if samples else float("nan")
+        return value, value, value
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return q[49], q[94], q[98]
+
+
+def run_scenario(mode, iterations, trace_memory=False):
+    at = _open(mode)
+    steps = SCENARIOS[mode](at)
+    timings = {}
+    if trace_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+    for _ in range(iterations):
+        action, states = step if isinstance(step := next(steps), tuple) else (step, None)
+        start = time.perf_counter()
+        if states is None:
+            at.run()
+        else:
+            _run_with(at, states)
+        timings.setdefault(action, []).append((time.perf_counter() - start) * 1000)
+        if at.exception:
+            raise RuntimeError(f"{mode}/{action}: {at.exception[0].value}")
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return timings, peak, state_sizes(at.session_state)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cards", type=int, nargs="+", default=[100, 10000],
+                        help="deck sizes (flashcards; other content scales along)")
+    parser.add_argument("--modes", nargs="+", choices=list(MODE_LABELS), default=list(MODE_LABELS))
+    parser.add_argument("--iterations", type=int, default=30, help="timed interactions per mode")
+    parser.add_argument("--memory-iterations", type=int, default=10,
+                        help="interactions in the tracemalloc pass (0 to skip)")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    parser.add_argument("--max-p95-ms", type=float,
+                        help="exit with status 1 if any mode's p95 exceeds this")
+    args = parser.parse_args(argv)
+    if "memory" in args.modes:
+        _check_apptest()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["LERNEN_PROGRESS_DB"] = str(Path(tmp) / "progress.sqlite")
+        for cards in args.cards:
+            os.environ["LERNEN_DECK"] = str(make_deck(Path(tmp) / f"deck_{cards}.json", cards))
+            for mode in args.modes:
+                timings, _, sizes = run_scenario(mode, args.iterations)
+                peak = None
+                if args.memory_iterations:
+                    _, peak, _ = run_scenario(mode, args.memory_iterations, trace_memory=True)
+                samples = [t for values in timings.values() for t in values]
+                p50, p95, p99 = percentiles(samples)
+                results.append({
+                    "cards": cards,
+                    "mode": mode,
+                    "runs": len(samples),
+                    "p50_ms": p50,
+                    "p95_ms": p95,
+                    "p99_ms": p99,
+                    "peak_mib": None if peak is None else peak / 2**20,
+                    "session_bytes": sum(sizes.values()),
+                    "session_largest": dict(list(sizes.items())[:5]),
+                    "actions": {action: percentiles(values)[0] for action, values in timings.items()},
+                })
+                row = results[-1]
+                peak_text = "-" if row["peak_mib"] is None else f"{row['peak_mib']:.1f}"
+                print(f"{cards:>7} {mode:<13} n={row['runs']:<4} p50={p50:7.1f} ms  "
+                      f"p95={p95:7.1f} ms  p99={p99:7.1f} ms  peak={peak_text} MiB  "
+                      f"session={row['session_bytes'] / 1024:.1f} KiB", flush=True)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.max_p95_ms is not None:
+        slow = [r for r in results if r["p95_ms"] > args.max_p95_ms]
+        for r in slow:
+            print(f"REGRESSION: {r['mode']} with {r['cards']} cards: p95 {r['p95_ms']:.1f} ms "
+                  f"> {args.max_p95_ms:.1f} ms", file=sys.stderr)
+        return 1 if slow else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+"""Concurrent-session load test: how many learners can one server process take?
+
+Example::
+
+    python benchmarks/load_test.py --sessions 40 --workers 4 --steps 10
+    python benchmarks/load_test.py --sessions 100 --cards 10000 --json last.json --max-p95-ms 500
+
+Every worker is a real ``streamlit run`` server. The learners are websocket
+clients that talk to it like a browser tab: a click sends the page's widget
+states (and the fragment the button sits in), and the rerun is timed until
+the server reports it finished. All learners of a server are active at
+once, so their reruns overlap in its script threads as in production; a
+think time between interactions keeps them from running in lockstep. Each
+learner rates Karteikarten, answers Quiz questions and flips Memory cards.
+The report gives throughput over all servers, rerun latency percentiles per
+mode and the resident memory each open session adds to its server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from bench_modes import APP, MODE_LABELS, percentiles
+from synthetic_deck import make_deck
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from deck_store import ensure_deck  # noqa: E402
+
+SCRIPT = ("karteikarten", "quiz", "memory")
+BASE_PORT = 8600
+STARTUP_TIMEOUT = 60  # seconds for a server to answer its health check
+RUN_TIMEOUT = 120  # seconds for one rerun
+FINISHED = {
+    ForwardMsg.FINISHED_SUCCESSFULLY: "full",
+    ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY: "fragment",
+}
+
+
+def process_rss(pid):
+    # Resident size of another process; None without procfs
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+def start_server(port, env):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(APP), "--server.headless", "true",
+         "--server.port", str(port), "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server on port {port} exited with {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"server on port {port} did not start within {STARTUP_TIMEOUT} s")
+
+
+class Page:
+    """The elements a browser would show, kept up to date from the server's deltas."""
+
+    def __init__(self):
+        self.elements = {}  # delta path -> (fragment id, element)
+        self._touched = set()
+        self._blocks = set()
+        self._fragments = set()
+
+    def apply(self, msg):
+        path = tuple(msg.metadata.delta_path)
+        delta = msg.delta
+        self._touched.add(path)
+        if delta.fragment_id:
+            self._fragments.add(delta.fragment_id)
+        if delta.WhichOneof("type") == "new_element":
+            self.elements[path] = (delta.fragment_id, delta.new_element)
+        elif delta.WhichOneof("type") == "add_block":
+            self.elements.pop(path, None)
+            self._blocks.add(path)
+
+    def restart(self):
+        # A run that stopped early for a rerun: what it sent is superseded
+        self._touched.clear()
+        self._blocks.clear()
+        self._fragments.clear()
+
+    def finish(self, kind):
+        # Like the frontend: elements a run did not send again are dropped, after a fragment
+        # run only those inside the fragments it reran
+        def stale(path, fragment_id):
+            if path in self._touched:
+                return False
+            if kind == "full":
+                return True
+            return fragment_id in self._fragments or any(path[:len(b)] == b for b in self._blocks)
+
+        self.elements = {p: e for p, e in self.elements.items() if not stale(p, e[0])}
+        self.restart()
+
+    def widgets(self, kind):
+        for fragment_id, element in self.elements.values():
+            if element.WhichOneof("type") == kind:
+                yield fragment_id, getattr(element, kind)
+
+    def button(self, label=None, key=None):
+        for fragment_id, button in self.widgets("button"):
+            if (label is None or button.label == label) and (key is None or button.id.endswith(f"-{key}")):
+                return fragment_id, button
+        return None
+
+    def buttons(self, key_prefix):
+        return [(f, b) for f, b in self.widgets("button") if b.id.rpartition("-")[2].startswith(key_prefix)]
+
+    def errors(self):
+        return [e.exception.message for _, e in self.elements.values() if e.WhichOneof("type") == "exception"]
+
+
+class Learner:
+    """One browser tab on a server; unlike a browser it does not poll timer fragments (the Memory reveal)."""
+
+    def __init__(self, port):
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        self.page = Page()
+        self.widget_states = {}  # widget id -> WidgetState, values the learner set
+        self.query_string = ""
+        self._ws = None
+
+    async def open(self):
+        self._ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+        await self.rerun()
+
+    async def close(self):
+        await self._ws.close()
+
+    async def rerun(self, trigger=None, fragment_id=""):
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.query_string = self.query_string
+        state.fragment_id = fragment_id
+        state.widget_states.widgets.extend(self.widget_states.values())
+        if trigger is not None:
+            click = state.widget_states.widgets.add()
+            click.id = trigger
+            click.trigger_value = True
+        await self._ws.send(msg.SerializeToString())
+        await asyncio.wait_for(self._receive(), RUN_TIMEOUT)
+        errors = self.page.errors()
+        if errors:
+            raise RuntimeError(errors[0])
+
+    async def _receive(self):
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await self._ws.recv())
+            kind = msg.WhichOneof("type")
+            if kind == "delta":
+                self.page.apply(msg)
+            elif kind == "page_info_changed":
+                # The app keeps user, deck and session in the URL, like a reload would
+                self.query_string = msg.page_info_changed.query_string
+            elif kind == "script_finished":
+                if msg.script_finished in FINISHED:
+                    self.page.finish(FINISHED[msg.script_finished])
+                    return
+                self.page.restart()
+
+    async def click(self, widget):
+        fragment_id, button = widget
+        await self.rerun(button.id, fragment_id)
+
+    async def select_mode(self, label):
+        _, radio = next(w for w in self.page.widgets("radio") if w[1].id.endswith("-mode"))
+        state = WidgetState(id=radio.id, string_value=label)
+        self.widget_states[radio.id] = state
+        await self.rerun()
+
+
+# What a learner clicks next in each mode, read off the page like a person would
+def karteikarten(page):
+    rate = page.button("🙂 Gut")
+    return ("rate", rate) if rate else ("flip", page.button("🔄 Karte umdrehen"))
+
+
+def quiz(page):
+    for action, label in (("restart", "Quiz wiederholen 🔄"), ("next", "Nächste Frage ➡️")):
+        widget = page.button(label)
+        if widget:
+            return action, widget
+    return "answer", page.button(key="opt_0")
+
+
+def memory(page):
+    closed = page.buttons("mem_")
+    return ("flip", closed[0]) if closed else ("restart", page.button("Neu starten 🔄"))
+
+
+SCENARIOS = {"karteikarten": karteikarten, "quiz": quiz, "memory": memory}
+
+
+async def learn(learner, steps_per_mode, think, rng, timings):
+    async def timed(action, run):
+        start = time.perf_counter()
+        await run
+        timings.setdefault(action, []).append((time.perf_counter() - start) * 1000)
+        # Reading the card, a uniform spread keeps the learners out of step
+        await asyncio.sleep(think * rng.uniform(0.5, 1.5))
+
+    await timed("open", learner.open())
+    for mode in SCRIPT:
+        if mode != "karteikarten":
+            await timed(f"{mode}:switch", learner.select_mode(MODE_LABELS[mode]))
+        for _ in range(steps_per_mode):
+            action, widget = SCENARIOS[mode](learner.page)
+            if widget is None:
+                raise RuntimeError(f"{mode}/{action}: nothing to click")
+            await timed(f"{mode}:{action}", learner.click(widget))
+
+
+async def run_server(port, pid, sessions, steps_per_mode, think, seed):
+    # One learner warms the imports and the process-wide caches, so it is not counted per session
+    warm = Learner(port)
+    await warm.open()
+    await warm.close()
+    rss_base = process_rss(pid)
+    timings = {}
+    learners = [Learner(port) for _ in range(sessions)]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        learn(learner, steps_per_mode, think, random.Random(seed * 1000 + i), timings)
+        for i, learner in enumerate(learners)
+    ))
+    elapsed = time.perf_counter() - start
+    # Measured while every session is still open
+    rss_end = process_rss(pid)
+    await asyncio.gather(*(learner.close() for learner in learners))
+    return {
+        "sessions": sessions,
+        "elapsed": elapsed,
+        "rss_base": rss_base,
+        "rss_end": rss_end,
+        "timings": timings,
+    }
+
+
+async def run_all(servers, shares, steps_per_mode, think):
+    return await asyncio.gather(*(
+        run_server(port, server.pid, share, steps_per_mode, think, seed)
+        for seed, ((port, server), share) in enumerate(zip(servers.items(), shares))
+    ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=20, help="simultaneous learners in total")
+    parser.add_argument("--workers", type=int, default=1, help="server processes the sessions are spread over")
+    parser.add_argument("--steps", type=int, default=10, help="interactions per mode and learner")
+    parser.add_argument("--think", type=float, default=1.0,
+                        help="mean seconds a learner waits between interactions (0: back to back)")
+    parser.add_argument("--cards", type=int, default=1000,
+                        help="deck size (flashcards; other content scales along)")
+    parser.add_argument("--port", type=int, default=BASE_PORT, help="port of the first server")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    parser.add_argument("--max-p95-ms", type=float,
+                        help="exit with status 1 if the overall p95 exceeds this")
+    args = parser.parse_args(argv)
+
+    workers = max(1, min(args.workers, args.sessions))
+    shares = [args.sessions // workers + (i < args.sessions % workers) for i in range(workers)]
+    with tempfile.TemporaryDirectory() as tmp:
+        # Every server opens the same deck and progress database
+        env = dict(os.environ)
+        env["LERNEN_PROGRESS_DB"] = str(Path(tmp) / "progress.sqlite")
+        env["LERNEN_DECK"] = str(ensure_deck(make_deck(Path(tmp) / "deck.json", args.cards)))
+        start = time.perf_counter()
+        servers = {}  # port -> server process
+        try:
+            for port in range(args.port, args.port + workers):
+                servers[port] = start_server(port, env)
+            reports = asyncio.run(run_all(servers, shares, args.steps, args.think))
+        finally:
+            for server in servers.values():
+                server.terminate()
+            for server in servers.values():
+                server.wait()
+        wall = time.perf_counter() - start
+
+    timings = {}
+    for report in reports:
+        for action, values in report["timings"].items():
+            timings.setdefault(action, []).extend(values)
+    by_mode = {}
+    for action, values in timings.items():
+        by_mode.setdefault(action.partition(":")[0], []).extend(values)
+    samples = [t for values in timings.values() for t in values]
+    p50, p95, p99 = percentiles(samples)
+    # Measured from the first session opened to the last run, without server start and warm-up
+    busy = max(r["elapsed"] for r in reports)
+    growth = [(r["rss_end"] - r["rss_base"]) / r["sessions"] for r in reports if r["rss_end"] is not None]
+    result = {
+        "sessions": args.sessions,
+        "workers": workers,
+        "cards": args.cards,
+        "think_s": args.think,
+        "runs": len(samples),
+        "wall_s": wall,
+        "busy_s": busy,
+        "runs_per_s": len(samples) / busy,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "modes": {mode: dict(zip(("p50_ms", "p95_ms", "p99_ms"), percentiles(values)))
+                  for mode, values in by_mode.items()},
+        "rss_per_session_mib": sum(growth) / len(growth) / 2**20 if growth else None,
+        "rss_end_mib": [None if r["rss_end"] is None else r["rss_end"] / 2**20 for r in reports],
+    }
+
+    print(f"{args.sessions} sessions on {workers} server(s), {args.cards} cards, {args.think:g} s think time: "
+          f"{len(samples)} runs in {busy:.1f} s = {result['runs_per_s']:.1f} runs/s ({wall:.1f} s with startup)")
+    print(f"  {'all':<13} p50={p50:7.1f} ms  p95={p95:7.1f} ms  p99={p99:7.1f} ms")
+    for mode, row in result["modes"].items():
+        print(f"  {mode:<13} p50={row['p50_ms']:7.1f} ms  p95={row['p95_ms']:7.1f} ms  "
+              f"p99={row['p99_ms']:7.1f} ms  n={len(by_mode[mode])}")
+    if growth:
+        print(f"  memory: +{result['rss_per_session_mib']:.2f} MiB per session, servers at "
+              f"{', '.join(f'{m:.0f}' for m in result['rss_end_mib'] if m is not None)} MiB")
+
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    if args.max_p95_ms is not None and p95 > args.max_p95_ms:
+        print(f"OVERLOAD: p95 {p95:.1f} ms > {args.max_p95_ms:.1f} ms with {args.sessions} sessions",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
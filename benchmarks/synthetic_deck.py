@@ -0,0 +1,63 @@
+"""Generate synthetic decks of arbitrary size for benchmarks and load tests."""
+import json
+import random
+from pathlib import Path
+
+SYLLABLES = (
+    "so", "ma", "to", "form", "stö", "rung", "schmerz", "angst", "ve", "ge", "ta", "tiv",
+    "sym", "ptom", "dia", "gno", "se", "the", "ra", "pie", "kör", "per", "lich", "be",
+    "las", "tung", "hy", "po", "chon", "drie", "kon", "ver", "si", "on", "neu", "ro",
+)
+
+
+def _word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def _phrase(rng, words):
+    return " ".join(_word(rng) for _ in range(words)).capitalize()
+
+
+def make_deck(path, cards, questions=None, pairs=None, mindmap_nodes=None, seed=0):
+    """Write a deck JSON with the given sizes and return its path.
+
+    Quiz questions, memory pairs and mindmap nodes default to a tenth of
+    the card count (with sensible minimums), so one ``cards`` knob scales
+    every mode.
+    """
+    rng = random.Random(seed)
+    questions = max(8, cards // 10) if questions is None else questions
+    pairs = max(8, cards // 10) if pairs is None else pairs
+    mindmap_nodes = max(9, cards // 10) if mindmap_nodes is None else mindmap_nodes
+
+    root = {"title": "Synthetisches Deck", "description": "Benchmark", "children": []}
+    nodes = [root]
+    for _ in range(mindmap_nodes - 1):
+        # Shallow, bushy tree: parents are drawn from the first nodes
+        parent = nodes[rng.randrange(min(len(nodes), 1 + len(nodes) // 4))]
+        child = {"title": _phrase(rng, 2), "description": _phrase(rng, 3), "children": []}
+        parent["children"].append(child)
+        nodes.append(child)
+
+    deck = {
+        "title": f"Synthetisches Deck ({cards} Karten)",
+        "flashcards": [
+            {"question": _phrase(rng, 3), "answer": _phrase(rng, 14)}
+            for _ in range(cards)
+        ],
+        "quiz_questions": [
+            {
+                "question": _phrase(rng, 8) + "?",
+                "options": [_phrase(rng, 3) for _ in range(4)],
+                "correct": rng.randrange(4),
+                "explanation": _phrase(rng, 12),
+            }
+            for _ in range(questions)
+        ],
+        "memory_pairs": [[_phrase(rng, 1), _phrase(rng, 3)] for _ in range(pairs)],
+        "mindmap": root,
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(deck, ensure_ascii=False), encoding="utf-8")
+    return path
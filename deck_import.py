@@ -0,0 +1,292 @@
+"""Bulk import of CSV/TSV files and Anki exports into a SQLite deck.
+
+Example::
+
+    python deck_import.py karten.csv --deck decks/meine_karten.sqlite
+    python deck_import.py quiz.tsv --deck decks/meine_karten.sqlite --title "Meine Karten"
+    python deck_import.py anki_export.txt anki_export.apkg --deck decks/anki.sqlite --kind flashcards
+
+CSV and TSV files need a header row; the kind of content is detected from
+its columns (``question``/``answer``, ``question``/``options``/``correct``/
+``explanation`` or ``term``/``definition``, German names work as well).
+Quiz options are separated by ``|`` and ``correct`` is the 0-based index of
+the right one. Rows are streamed straight into the database, so memory use
+does not grow with the file; cards whose question (or memory term) already
+exists are skipped.
+"""
+import argparse
+import csv
+import hashlib
+import html
+import itertools
+import json
+import re
+import sqlite3
+import sys
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from deck_store import HASH_INDEXES, SCHEMA, ensure_deck, insert_rows, migrate
+
+COLUMNS = {
+    "flashcards": ("question", "answer"),
+    "quiz_questions": ("question", "options", "correct", "explanation"),
+    "memory_pairs": ("term", "definition"),
+}
+KINDS = {"flashcards": "flashcards", "quiz": "quiz_questions", "memory": "memory_pairs"}
+ALIASES = {
+    "frage": "question",
+    "antwort": "answer",
+    "optionen": "options",
+    "richtig": "correct",
+    "erklaerung": "explanation",
+    "erklärung": "explanation",
+    "begriff": "term",
+    "front": "question",
+    "back": "answer",
+}
+OPTION_SEPARATOR = "|"
+MAX_REPORTED_ERRORS = 20
+
+_TAG = re.compile(r"<[^>]+>")
+_BREAK = re.compile(r"<br\s*/?>|</div>", re.IGNORECASE)
+
+
+@dataclass
+class ImportResult:
+    path: Path
+    table: str
+    inserted: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    errors: list = field(default_factory=list)  # (line, message), the first MAX_REPORTED_ERRORS only
+
+
+def _strip_html(text):
+    return html.unescape(_TAG.sub("", _BREAK.sub("\n", text))).strip()
+
+
+def read_delimited(path, delimiter):
+    """Yield ``(line, row)`` with ``row`` keyed by the normalized header names."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        keys = [ALIASES.get(name.strip().lower(), name.strip().lower()) for name in header]
+        for values in reader:
+            if any(values):
+                yield reader.line_num, dict(zip(keys, values))
+
+
+def read_anki_text(path):
+    """Yield ``(line, values)`` from an Anki "Notes in Plain Text" export.
+
+    Newer exports start with ``#key:value`` lines naming the separator and
+    the columns that hold note type, deck, tags or GUID; those columns are
+    dropped, the remaining ones are the note fields.
+    """
+    options = {"separator": "tab", "html": "true"}
+    skip = set()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header_lines = 0
+        for line in f:
+            if not line.startswith("#"):
+                break
+            header_lines += 1
+            key, _, value = line[1:].strip().partition(":")
+            if key.endswith(" column"):
+                skip.add(int(value) - 1)
+            else:
+                options[key] = value
+        f.seek(0)
+        for _ in range(header_lines):
+            f.readline()
+
+        separator = options["separator"]
+        delimiter = {"tab": "\t", "comma": ",", "semicolon": ";", "pipe": "|", "space": " "}.get(
+            separator.lower(), separator
+        )
+        clean = _strip_html if options["html"].lower() == "true" else str.strip
+        reader = csv.reader(f, delimiter=delimiter)
+        for values in reader:
+            if any(values):
+                yield header_lines + reader.line_num, [clean(v) for i, v in enumerate(values) if i not in skip]
+
+
+def read_apkg(path):
+    """Yield ``(note, values)`` from an Anki package, one entry per note."""
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+        if "collection.anki21b" in names:
+            raise ValueError(
+                f"{path}: Dieses Anki-Paket nutzt das neue, komprimierte Format. Bitte in Anki "
+                "als 'Notizen als Text' exportieren oder 'Unterstützung älterer Anki-Versionen' wählen."
+            )
+        name = next((n for n in ("collection.anki21", "collection.anki2") if n in names), None)
+        if name is None:
+            raise ValueError(f"{path}: Keine Anki-Sammlung im Paket gefunden")
+        with tempfile.TemporaryDirectory() as tmp:
+            collection = archive.extract(name, tmp)
+            conn = sqlite3.connect(f"file:{collection}?mode=ro", uri=True)
+            try:
+                for note, (fields,) in enumerate(conn.execute("SELECT flds FROM notes ORDER BY id"), start=1):
+                    yield note, [_strip_html(value) for value in fields.split("\x1f")]
+            finally:
+                conn.close()
+
+
+def read_rows(path, fmt, table=None):
+    if fmt == "csv":
+        return read_delimited(path, ",")
+    if fmt == "tsv":
+        return read_delimited(path, "\t")
+    # Anki notes have no header: their fields are taken in column order (flashcards unless told otherwise)
+    notes = read_apkg(path) if fmt == "apkg" else read_anki_text(path)
+    columns = COLUMNS[table or "flashcards"]
+    return ((line, dict(zip(columns, values))) for line, values in notes)
+
+
+def guess_format(path):
+    return {".csv": "csv", ".tsv": "tsv", ".apkg": "apkg"}.get(Path(path).suffix.lower(), "anki")
+
+
+def parse_row(table, row):
+    # Returns the row in insert_rows order, or raises ValueError with a German message
+    missing = [name for name in COLUMNS[table] if not (row.get(name) or "").strip()]
+    if missing:
+        raise ValueError(f"Leere oder fehlende Spalte(n): {', '.join(missing)}")
+    if table != "quiz_questions":
+        return tuple(row[name].strip() for name in COLUMNS[table])
+
+    options = [option.strip() for option in row["options"].split(OPTION_SEPARATOR)]
+    if len(options) < 2 or not all(options):
+        raise ValueError(f"Mindestens zwei nicht-leere Optionen nötig, getrennt durch '{OPTION_SEPARATOR}'")
+    try:
+        correct = int(row["correct"])
+    except ValueError:
+        raise ValueError(f"'correct' muss eine Zahl sein, nicht {row['correct']!r}") from None
+    if not 0 <= correct < len(options):
+        raise ValueError(f"'correct' muss zwischen 0 und {len(options) - 1} liegen, nicht {correct}")
+    return (
+        row["question"].strip(),
+        json.dumps(options, ensure_ascii=False),
+        correct,
+        row["explanation"].strip(),
+    )
+
+
+def detect_table(columns):
+    for table in ("quiz_questions", "flashcards", "memory_pairs"):
+        if set(COLUMNS[table]) <= set(columns):
+            return table
+    raise ValueError(f"Spalten {sorted(columns)} passen zu keiner Inhaltsart ({', '.join(KINDS)})")
+
+
+def import_file(conn, path, fmt=None, table=None):
+    """Stream one file into ``conn``; the caller owns the transaction."""
+    path = Path(path)
+    rows = read_rows(path, fmt or guess_format(path), table)
+    first = next(rows, None)
+    if first is None:
+        return ImportResult(path, table or "flashcards")
+    result = ImportResult(path, table or detect_table(first[1]))
+    valid = 0
+
+    def parsed():
+        nonlocal valid
+        for line, row in itertools.chain((first,), rows):
+            try:
+                values = parse_row(result.table, row)
+            except ValueError as exc:
+                result.rejected += 1
+                if len(result.errors) < MAX_REPORTED_ERRORS:
+                    result.errors.append((line, str(exc)))
+                continue
+            valid += 1
+            yield values
+
+    result.inserted = insert_rows(conn, result.table, parsed())
+    result.duplicates = valid - result.inserted
+    return result
+
+
+def open_deck(db_path, title=None):
+    db_path = Path(db_path)
+    created = not db_path.exists()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    if created:
+        conn.executescript(SCHEMA)
+        conn.executescript(HASH_INDEXES)
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [("title", title or db_path.stem), ("version", "")],
+        )
+    else:
+        migrate(conn)
+        if title:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('title', ?)", (title,))
+    return conn
+
+
+def bump_version(conn):
+    # Caches keyed by the deck version (mindmap, search index, ...) rebuild on the next run
+    old = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    counts = [conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in COLUMNS]
+    version = hashlib.sha1(f"{old[0] if old else ''}:{counts}".encode()).hexdigest()[:12]
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,))
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--deck", type=Path, required=True,
+                        help="target deck: a .sqlite file (created if missing)")
+    parser.add_argument("--allow-json-deck", action="store_true",
+                        help="import into a deck built from a JSON source anyway; "
+                             "the imported cards are lost when it is rebuilt")
+    parser.add_argument("--kind", choices=list(KINDS), help="content kind (default: detected from the header)")
+    parser.add_argument("--format", choices=("csv", "tsv", "anki", "apkg"),
+                        help="input format (default: from the file extension, otherwise Anki text)")
+    parser.add_argument("--title", help="deck title shown in the app")
+    args = parser.parse_args(argv)
+
+    # The SQLite file of a JSON deck is rebuilt from the JSON whenever that changes
+    json_source = args.deck.with_suffix(".json")
+    if (args.deck.suffix == ".json" or json_source.exists()) and not args.allow_json_deck:
+        print(f"Import abgebrochen: {args.deck} wird aus {json_source} neu gebaut, importierte Karten "
+              "gingen dabei verloren. Eigenes .sqlite-Deck wählen oder --allow-json-deck angeben.",
+              file=sys.stderr)
+        return 2
+    db_path = ensure_deck(args.deck)
+    conn = open_deck(db_path, args.title)
+    failed = False
+    try:
+        # One transaction: the app never sees a half-imported file
+        with conn:
+            results = [import_file(conn, path, args.format, KINDS.get(args.kind)) for path in args.files]
+            if any(r.inserted for r in results):
+                bump_version(conn)
+    except (OSError, ValueError, csv.Error) as exc:
+        print(f"Import abgebrochen: {exc}", file=sys.stderr)
+        return 2
+    finally:
+        conn.close()
+
+    for r in results:
+        print(f"{r.path}: {r.inserted} neu, {r.duplicates} doppelt, {r.rejected} ungültig ({r.table})")
+        for line, message in r.errors:
+            print(f"  Zeile {line}: {message}", file=sys.stderr)
+        if r.rejected > len(r.errors):
+            print(f"  … und {r.rejected - len(r.errors)} weitere", file=sys.stderr)
+        failed = failed or r.rejected > 0
+    print(f"Deck: {db_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
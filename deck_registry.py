@@ -0,0 +1,172 @@
+"""Registry of all decks in a directory, opened on first use and closed least recently used first."""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from deck_store import DeckStore, ensure_deck
+
+MAX_OPEN_DECKS = 8
+DECK_SUFFIXES = (".json", ".sqlite")
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs (macOS): the peak is the closest stdlib figure, and in bytes there
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def progress_key(user_id, deck_name, default):
+    # The default deck keeps the bare user id, so progress saved before there were several decks stays found
+    return user_id if deck_name == default else f"{user_id}@{deck_name}"
+
+
+def deck_users(keys, deck_name, default):
+    """The progress keys (see ``progress_key``) that belong to one deck."""
+    suffix = f"@{deck_name}"
+    return [key for key in keys if key.endswith(suffix) or (deck_name == default and "@" not in key)]
+
+
+@dataclass(slots=True)
+class _OpenDeck:
+    store: DeckStore
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    derived: dict = field(default_factory=dict)  # kind -> (deck version, value)
+    size: int = 0  # bytes the process grew by while opening it and building its derived data
+
+
+class DeckRegistry:
+    """Every deck in ``directory`` by name (the file name without suffix).
+
+    A deck is a JSON source or an imported ``.sqlite`` file; JSON decks are
+    (re)built into SQLite when first opened. Only the ``max_open`` most
+    recently used decks stay open, together with everything derived from
+    them (mindmap figure, search index, distractor index), and with a
+    ``memory_limit`` in bytes only as many as fit into it. A deck's size
+    is estimated from how much the process grew while it was opened and
+    its derived data built; the resident size of the whole process is no
+    measure, as it rarely shrinks once Python freed the objects. Decks are
+    only dropped when a deck or derived data is added. Sessions that still
+    hold a dropped deck keep using it until their next run picks it up again.
+    """
+
+    def __init__(self, directory, default_path=None, max_open=MAX_OPEN_DECKS, memory_limit=None):
+        self.directory = Path(directory)
+        self.max_open = max_open
+        self.memory_limit = memory_limit
+        self._lock = threading.RLock()
+        self._scanned = None
+        self._paths = {}
+        self._titles = {}  # name -> (mtime, title)
+        self._open = OrderedDict()  # name -> _OpenDeck, least recently used first
+        # A default deck outside the directory (LERNEN_DECK=/elsewhere/deck.json) is listed too
+        self._extra = {}
+        if default_path is not None:
+            default_path = Path(default_path)
+            self.default = default_path.stem
+            if default_path.resolve().parent != self.directory.resolve():
+                self._extra[self.default] = default_path
+        else:
+            self.default = next(iter(self.names()), None)
+
+    def _scan(self):
+        # Listing the directory again only when a deck file was added, removed or rebuilt
+        try:
+            mtime = self.directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._scanned:
+            return
+        paths = {}
+        if mtime is not None:
+            for path in sorted(self.directory.iterdir()):
+                # JSON wins over the SQLite file built from it
+                if path.suffix in DECK_SUFFIXES and (path.suffix == ".json" or path.stem not in paths):
+                    paths[path.stem] = path
+        self._paths = paths
+        self._scanned = mtime
+
+    def names(self):
+        with self._lock:
+            self._scan()
+            return sorted({*self._paths, *self._extra})
+
+    def __contains__(self, name):
+        return name in self.names()
+
+    def path(self, name):
+        with self._lock:
+            self._scan()
+            if name in self._extra:
+                return self._extra[name]
+            return self._paths[name]
+
+    def title(self, name):
+        """The deck's title, read from its meta table without opening it for good."""
+        with self._lock:
+            if name in self._open:
+                return self._open[name].store.title
+            path = self.path(name)
+            db_path = path.with_suffix(".sqlite")
+            mtime = db_path.stat().st_mtime_ns if db_path.exists() else None
+            cached = self._titles.get(name)
+            if cached is None or cached[0] != mtime:
+                title = name
+                if mtime is not None:
+                    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+                    try:
+                        row = conn.execute("SELECT value FROM meta WHERE key = 'title'").fetchone()
+                        title = row[0] if row else name
+                    except sqlite3.Error:
+                        pass
+                    finally:
+                        conn.close()
+                self._titles[name] = cached = (mtime, title)
+            return cached[1]
+
+    def open(self, name):
+        """The deck's store, opened (and built from JSON) on first use; raises KeyError for unknown names."""
+        with self._lock:
+            entry = self._open.get(name)
+            if entry is None:
+                before = rss_bytes()
+                entry = self._open[name] = _OpenDeck(DeckStore(ensure_deck(self.path(name))))
+                entry.size = max(0, rss_bytes() - before)
+                self._trim(name)
+            self._open.move_to_end(name)
+            return entry.store
+
+    def derived(self, name, kind, build):
+        """``build(store)`` once per deck version, shared by all sessions and kept until the deck is dropped."""
+        store = self.open(name)
+        with self._lock:
+            entry = self._open.get(name) or _OpenDeck(store)
+        # Built outside the registry lock: a big search index must not hold up other decks
+        with entry.lock:
+            version = store.version
+            cached = entry.derived.get(kind)
+            built = cached is None or cached[0] != version
+            if built:
+                # Builds for other decks at the same time count here too; an estimate errs on the large side
+                before = rss_bytes()
+                entry.derived[kind] = cached = (version, build(store))
+                entry.size += max(0, rss_bytes() - before)
+        if built:
+            with self._lock:
+                self._trim(name)
+        return cached[1]
+
+    def _trim(self, keep):
+        while len(self._open) > 1 and (
+            len(self._open) > self.max_open
+            or (self.memory_limit is not None and sum(e.size for e in self._open.values()) > self.memory_limit)
+        ):
+            oldest = next(name for name in self._open if name != keep)
+            # Not closed: a session may be in the middle of a run with it; the last reference closes it
+            del self._open[oldest]
@@ -0,0 +1,272 @@
+"""SQLite deck storage, opened once per process and shared read-only across sessions."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flashcards (
+    id INTEGER PRIMARY KEY,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    content_hash BLOB
+);
+CREATE TABLE IF NOT EXISTS quiz_questions (
+    id INTEGER PRIMARY KEY,
+    question TEXT NOT NULL,
+    options TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    explanation TEXT NOT NULL,
+    content_hash BLOB
+);
+CREATE TABLE IF NOT EXISTS memory_pairs (
+    id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL,
+    definition TEXT NOT NULL,
+    content_hash BLOB
+);
+CREATE TABLE IF NOT EXISTS mindmap_nodes (
+    id INTEGER PRIMARY KEY,
+    parent INTEGER REFERENCES mindmap_nodes(id),
+    title TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+"""
+
+# Unique per table, so a second copy of a card is ignored on insert
+HASH_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS flashcards_hash ON flashcards (content_hash);
+CREATE UNIQUE INDEX IF NOT EXISTS quiz_questions_hash ON quiz_questions (content_hash);
+CREATE UNIQUE INDEX IF NOT EXISTS memory_pairs_hash ON memory_pairs (content_hash);
+"""
+
+# Ids stay dense (0..n-1) because a skipped duplicate never takes one
+INSERT_SQL = {
+    "flashcards": (
+        "INSERT OR IGNORE INTO flashcards (id, question, answer, content_hash) "
+        "SELECT COALESCE(MAX(id) + 1, 0), ?, ?, ? FROM flashcards"
+    ),
+    "quiz_questions": (
+        "INSERT OR IGNORE INTO quiz_questions (id, question, options, correct, explanation, content_hash) "
+        "SELECT COALESCE(MAX(id) + 1, 0), ?, ?, ?, ?, ? FROM quiz_questions"
+    ),
+    "memory_pairs": (
+        "INSERT OR IGNORE INTO memory_pairs (id, term, definition, content_hash) "
+        "SELECT COALESCE(MAX(id) + 1, 0), ?, ?, ? FROM memory_pairs"
+    ),
+}
+HASHED_COLUMN = {"flashcards": "question", "quiz_questions": "question", "memory_pairs": "term"}
+
+CARD_CACHE_SIZE = 1024
+MINDMAP_HINTS = ("tip", "warning")
+
+
+def content_hash(text):
+    # Cards count as duplicates when their question (or memory term) matches, ignoring case and spacing
+    return hashlib.blake2b(" ".join(text.casefold().split()).encode(), digest_size=8).digest()
+
+
+def insert_rows(conn, table, rows):
+    """Insert ``rows`` (columns without id and hash), skipping duplicates; returns the number inserted."""
+    before = conn.total_changes
+    conn.executemany(INSERT_SQL[table], ((*row, content_hash(row[0])) for row in rows))
+    return conn.total_changes - before
+
+
+def migrate(conn):
+    # Decks built before deduplication lack the hash column; later copies of a card keep NULL
+    for table, column in HASHED_COLUMN.items():
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if "content_hash" in columns:
+            continue
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN content_hash BLOB")
+        seen = set()
+        updates = []
+        for row_id, text in conn.execute(f"SELECT id, {column} FROM {table} ORDER BY id"):
+            digest = content_hash(text)
+            if digest not in seen:
+                seen.add(digest)
+                updates.append((digest, row_id))
+        conn.executemany(f"UPDATE {table} SET content_hash = ? WHERE id = ?", updates)
+    conn.executescript(HASH_INDEXES)
+
+
+def _mindmap_rows(node, parent=None, rows=None):
+    # Flatten the nested mindmap into (id, parent, title, description) rows
+    if rows is None:
+        rows = []
+    node_id = len(rows)
+    rows.append((node_id, parent, node["title"], node.get("description", "")))
+    for child in node.get("children", []):
+        _mindmap_rows(child, node_id, rows)
+    return rows
+
+
+def build_deck(json_path, db_path):
+    json_path, db_path = Path(json_path), Path(db_path)
+    raw = json_path.read_bytes()
+    deck = json.loads(raw)
+
+    # Build into a temp file and swap it in, so readers never see a half-written deck
+    tmp_path = db_path.with_name(db_path.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executescript(HASH_INDEXES)
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("title", deck.get("title", json_path.stem)),
+                ("version", hashlib.sha1(raw).hexdigest()[:12]),
+                # Optional deck-specific hints shown next to the mindmap
+                *((key, deck[key]) for key in MINDMAP_HINTS if key in deck),
+            ],
+        )
+        insert_rows(conn, "flashcards", ((c["question"], c["answer"]) for c in deck.get("flashcards", [])))
+        insert_rows(
+            conn,
+            "quiz_questions",
+            (
+                (q["question"], json.dumps(q["options"], ensure_ascii=False), q["correct"], q["explanation"])
+                for q in deck.get("quiz_questions", [])
+            ),
+        )
+        insert_rows(conn, "memory_pairs", (tuple(pair) for pair in deck.get("memory_pairs", [])))
+        if "mindmap" in deck:
+            conn.executemany(
+                "INSERT INTO mindmap_nodes (id, parent, title, description) VALUES (?, ?, ?, ?)",
+                _mindmap_rows(deck["mindmap"]),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return db_path
+
+
+def ensure_deck(json_path):
+    # (Re)build the SQLite file next to the JSON source when it is missing or stale
+    json_path = Path(json_path)
+    if json_path.suffix == ".sqlite":
+        # Decks created by deck_import.py have no JSON source
+        return json_path
+    db_path = json_path.with_suffix(".sqlite")
+    if not db_path.exists() or db_path.stat().st_mtime < json_path.stat().st_mtime:
+        build_deck(json_path, db_path)
+    return db_path
+
+
+class DeckStore:
+    def __init__(self, db_path):
+        self.path = Path(db_path)
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._meta = {}
+        self._counts = {}
+
+        # Per-process row caches, so a rerun only touches the rows it shows
+        self.flashcard = lru_cache(maxsize=CARD_CACHE_SIZE)(self._flashcard)
+        self.quiz_question = lru_cache(maxsize=CARD_CACHE_SIZE)(self._quiz_question)
+        self.memory_pair = lru_cache(maxsize=CARD_CACHE_SIZE)(self._memory_pair)
+        self._refresh()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _refresh(self):
+        # PRAGMA data_version only changes when another connection committed (e.g. an import)
+        data_version = self._query("PRAGMA data_version")[0][0]
+        if data_version == self._data_version:
+            return
+        self._meta = dict(self._query("SELECT key, value FROM meta"))
+        self._counts = {
+            table: self._query(f"SELECT COUNT(*) FROM {table}")[0][0]
+            for table in ("flashcards", "quiz_questions", "memory_pairs")
+        }
+        self.flashcard.cache_clear()
+        self.quiz_question.cache_clear()
+        self.memory_pair.cache_clear()
+        self._data_version = data_version
+
+    @property
+    def title(self):
+        return self._meta.get("title", self.path.stem)
+
+    def meta(self, key, default=""):
+        self._refresh()
+        return self._meta.get(key, default)
+
+    @property
+    def version(self):
+        self._refresh()
+        return self._meta.get("version", "")
+
+    def flashcard_count(self):
+        self._refresh()
+        return self._counts["flashcards"]
+
+    def quiz_count(self):
+        self._refresh()
+        return self._counts["quiz_questions"]
+
+    def memory_pair_count(self):
+        self._refresh()
+        return self._counts["memory_pairs"]
+
+    def _flashcard(self, card_id):
+        row = self._query("SELECT question, answer FROM flashcards WHERE id = ?", (card_id,))
+        if not row:
+            raise IndexError(f"Karteikarte {card_id} nicht vorhanden")
+        question, answer = row[0]
+        return {"question": question, "answer": answer}
+
+    def _quiz_question(self, question_id):
+        row = self._query(
+            "SELECT question, options, correct, explanation FROM quiz_questions WHERE id = ?",
+            (question_id,),
+        )
+        if not row:
+            raise IndexError(f"Quizfrage {question_id} nicht vorhanden")
+        question, options, correct, explanation = row[0]
+        return {
+            "question": question,
+            "options": tuple(json.loads(options)),
+            "correct": correct,
+            "explanation": explanation,
+        }
+
+    def _memory_pair(self, pair_id):
+        row = self._query("SELECT term, definition FROM memory_pairs WHERE id = ?", (pair_id,))
+        if not row:
+            raise IndexError(f"Memory-Paar {pair_id} nicht vorhanden")
+        return row[0]
+
+    def flashcards(self):
+        return self._query("SELECT question, answer FROM flashcards ORDER BY id")
+
+    def quiz_texts(self):
+        # Searchable text of every question, without the answer key
+        rows = self._query("SELECT question, options, explanation FROM quiz_questions ORDER BY id")
+        return [(question, tuple(json.loads(options)), explanation) for question, options, explanation in rows]
+
+    def memory_pairs(self):
+        # Whole pool in one query, for callers that cache it per deck version
+        return tuple(self._query("SELECT term, definition FROM memory_pairs ORDER BY id"))
+
+    def mindmap_nodes(self):
+        return self._query("SELECT id, parent, title, description FROM mindmap_nodes ORDER BY id")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
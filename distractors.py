@@ -0,0 +1,106 @@
+"""Multiple-choice questions generated from flashcards, with the most similar answers as distractors."""
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from search_index import normalize
+
+DISTRACTORS = 3
+MAX_DF = 0.5  # terms in over half of all answers ("die", "und") say nothing about similarity
+MIN_CARDS_FOR_DF_CUTOFF = 20
+CACHE_SIZE = 4096
+
+
+class DistractorIndex:
+    """TF-IDF vectors of all flashcard answers, stored sparse in NumPy arrays.
+
+    The weights are kept twice: grouped by answer (to read one answer's
+    vector) and grouped by term (postings). Scoring one answer against all
+    others is then a single ``bincount`` over the postings of its own
+    terms, so a lookup touches only the answers that share a word with it
+    instead of a dense n x n similarity matrix.
+    """
+
+    def __init__(self, answers, deck=None):
+        self._deck = deck
+        self.size = n = len(answers)
+        vocabulary = {}
+        doc_ids, term_ids, counts = [], [], []
+        answer_keys = {}
+        groups = np.empty(n, dtype=np.int32)
+        for doc, text in enumerate(answers):
+            terms = normalize(text)
+            # Answers with the same words would be a second correct option
+            groups[doc] = answer_keys.setdefault(" ".join(terms), len(answer_keys))
+            for term, count in Counter(terms).items():
+                doc_ids.append(doc)
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                counts.append(count)
+
+        docs = np.array(doc_ids, dtype=np.int32)
+        terms = np.array(term_ids, dtype=np.int32)
+        df = np.bincount(terms, minlength=len(vocabulary))
+        idf = np.log((1 + n) / (1 + df)) + 1
+        weights = (1 + np.log(np.array(counts, dtype=np.float64))) * idf[terms]
+        if n >= MIN_CARDS_FOR_DF_CUTOFF:
+            weights[df[terms] > MAX_DF * n] = 0.0
+        norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=n))
+        weights /= np.where(norms[docs] > 0, norms[docs], 1.0)
+
+        # By answer: COO rows are already in answer order
+        self._row_ptr = np.concatenate(([0], np.cumsum(np.bincount(docs, minlength=n))))
+        self._row_terms = terms
+        self._row_weights = weights.astype(np.float32)
+        # By term
+        order = np.argsort(terms, kind="stable")
+        self._post_ptr = np.concatenate(([0], np.cumsum(df)))
+        self._post_docs = docs[order]
+        self._post_weights = self._row_weights[order]
+        self._groups = groups
+
+        self.nearest = lru_cache(maxsize=CACHE_SIZE)(self._nearest)
+        self.question = lru_cache(maxsize=CACHE_SIZE)(self._question)
+
+    @classmethod
+    def from_deck(cls, deck):
+        return cls([answer for _, answer in deck.flashcards()], deck)
+
+    def similarities(self, doc):
+        start, end = self._row_ptr[doc], self._row_ptr[doc + 1]
+        query_terms = self._row_terms[start:end]
+        query_weights = self._row_weights[start:end]
+        starts = self._post_ptr[query_terms]
+        lengths = self._post_ptr[query_terms + 1] - starts
+        # Indices of all postings of the query terms, without a Python loop
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        postings = offsets + np.arange(lengths.sum())
+        return np.bincount(
+            self._post_docs[postings],
+            weights=self._post_weights[postings] * np.repeat(query_weights, lengths),
+            minlength=self.size,
+        )
+
+    def _nearest(self, doc, k=DISTRACTORS):
+        """The ``k`` most similar answers that are not (equivalent to) ``doc``'s own."""
+        scores = self.similarities(doc)
+        scores[self._groups == self._groups[doc]] = -1.0
+        # Answers without any shared word (score 0) still beat too few options
+        candidates = int((scores >= 0).sum())
+        k = min(k, candidates)
+        if k == 0:
+            return ()
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return tuple(int(i) for i in top)
+
+    def _question(self, card_id):
+        card = self._deck.flashcard(card_id)
+        option_cards = (card_id, *self.nearest(card_id))
+        return {
+            "question": f"Was beschreibt „{card['question']}“?",
+            "options": tuple(self._deck.flashcard(i)["answer"] for i in option_cards),
+            "correct": 0,
+            "explanation": f"Aus der Karteikarte „{card['question']}“ erstellt.",
+            "option_cards": option_cards,
+        }
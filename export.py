@@ -0,0 +1,210 @@
+"""Progress reports as CSV, JSON or Markdown, generated lazily from the event log.
+
+Example::
+
+    python export.py --format csv --out kohorte.csv
+    python export.py --format markdown --users 3f2a… 9b1c… --out berichte.md
+
+Every format is produced as a stream of text chunks, one event at a time,
+and written to a temporary file; neither a single long history nor a whole
+cohort is ever held in memory on the command line. The app hands
+``export_bytes`` to ``st.download_button`` as a callable, so a report (of
+one learner) is only generated when someone actually clicks the download.
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from deck_registry import deck_users
+from deck_store import DeckStore, ensure_deck
+from progress_store import ProgressStore, well_formed
+from scheduler import RATINGS
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "json": ("application/json", "json"),
+    "markdown": ("text/markdown", "md"),
+}
+FIELDS = ("nutzer", "zeit", "art", "nr", "frage", "antwort", "ergebnis")
+HISTORY_KINDS = ("card_rated", "quiz_answered")
+SPOOL_SIZE = 1 << 20  # reports up to 1 MiB stay in memory, larger ones go to disk
+
+
+def _time(ts):
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+
+
+def history(store, deck, user_id, kinds=HISTORY_KINDS):
+    """Yield one flat record per card review or quiz answer, oldest first."""
+    # Events still in the write-behind buffer belong in the report
+    until_id, pending = store.unflushed(user_id, kinds)
+    for _, ts, kind, payload in itertools.chain(store.iter_events(user_id, kinds, until_id=until_id), pending):
+        if not well_formed(kind, payload):
+            continue
+        record = dict.fromkeys(FIELDS, "")
+        record.update(nutzer=user_id, zeit=_time(ts))
+        try:
+            if kind == "card_rated":
+                card = deck.flashcard(payload["card"])
+                record.update(art="karte", nr=payload["card"] + 1, frage=card["question"],
+                              antwort=card["answer"], ergebnis=RATINGS.get(payload["rating"], ""))
+            elif payload.get("source") == "karten":
+                # Generated from a flashcard; the chosen option is another card's answer
+                card = deck.flashcard(payload["question"])
+                record.update(art="quiz", nr=payload["question"] + 1, frage=card["question"],
+                              antwort=deck.flashcard(payload["choice_card"])["answer"],
+                              ergebnis="richtig" if payload["correct"] else "falsch")
+            else:
+                question = deck.quiz_question(payload["question"])
+                record.update(art="quiz", nr=payload["question"] + 1, frage=question["question"],
+                              antwort=question["options"][payload["choice"]],
+                              ergebnis="richtig" if payload["correct"] else "falsch")
+        except IndexError:
+            # The deck changed since; keep the event without its text
+            record.update(art="karte" if kind == "card_rated" else "quiz")
+        yield record
+
+
+def user_summary(store, deck, user_id):
+    snapshot = store.load(user_id) or {}
+    started = snapshot.get("start_time")
+    # Sessions are sampled from the bank, so the score counts against the last session's length
+    quiz = snapshot.get("quiz_engines", {}).get(snapshot.get("quiz_source", "deck")) or snapshot.get("quiz", {})
+    quiz_total = len(quiz.get("session", ())) or deck.quiz_count()
+    return {
+        "nutzer": user_id,
+        "karten_gelernt": len(snapshot.get("cards_studied", ())),
+        "karten_gesamt": deck.flashcard_count(),
+        "quiz_abgeschlossen": snapshot.get("quiz_completed", False),
+        "quiz_punkte": snapshot.get("quiz_score", 0),
+        "quiz_fragen": quiz_total,
+        "memory_abgeschlossen": snapshot.get("memory_completed", False),
+        "memory_zuege": snapshot.get("memory_moves", 0),
+        "fortschritt": round(snapshot.get("progress", 0)),
+        "lernbeginn": started,
+        # Active time from the time tracker; older snapshots only know when learning started
+        "lernzeit_minuten": int(snapshot["time"]["active"] // 60) if "time" in snapshot
+        else int((datetime.now() - datetime.fromisoformat(started)).total_seconds() // 60) if started else 0,
+        "achievements": snapshot.get("achievements", []),
+    }
+
+
+def csv_chunks(store, deck, user_ids):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, FIELDS)
+    writer.writeheader()
+    for user_id in user_ids:
+        for record in history(store, deck, user_id):
+            writer.writerow(record)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def json_chunks(store, deck, user_ids):
+    # A list of {"zusammenfassung", "verlauf"} objects, written element by element
+    yield "["
+    for i, user_id in enumerate(user_ids):
+        yield ",\n" if i else "\n"
+        summary = json.dumps(user_summary(store, deck, user_id), ensure_ascii=False)
+        yield f'{{"zusammenfassung": {summary}, "verlauf": ['
+        for j, record in enumerate(history(store, deck, user_id)):
+            yield (", " if j else "") + json.dumps(record, ensure_ascii=False)
+        yield "]}"
+    yield "\n]\n"
+
+
+def _cell(value):
+    return str(value).replace("|", "\\|").replace("\n", " ")
+
+
+def markdown_chunks(store, deck, user_ids):
+    yield f"# Lernfortschritt {deck.title}\n## Datum: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n"
+    for user_id in user_ids:
+        s = user_summary(store, deck, user_id)
+        quiz = f"{s['quiz_punkte'] / s['quiz_fragen'] * 100:.0f}%" if s["quiz_abgeschlossen"] and s["quiz_fragen"] else "offen"
+        memory = f"in {s['memory_zuege']} Zügen gelöst" if s["memory_abgeschlossen"] else "offen"
+        yield f"""
+## Nutzer {user_id}
+
+### 📊 Statistiken
+- Karteikarten gelernt: {s['karten_gelernt']}/{s['karten_gesamt']}
+- Quiz-Erfolg: {quiz}
+- Memory: {memory}
+- Gesamtfortschritt: {s['fortschritt']}%
+- Lernzeit: {s['lernzeit_minuten']} Minuten
+
+### 🏆 Achievements ({len(s['achievements'])})
+"""
+        for achievement in s["achievements"]:
+            yield f"- {achievement['title']}: {achievement['description']}\n"
+
+        yield "\n### 📇 Karteikarten-Verlauf\n\n| Zeit | Karte | Frage | Bewertung |\n|---|---|---|---|\n"
+        for r in history(store, deck, user_id, kinds=("card_rated",)):
+            yield f"| {r['zeit']} | {r['nr']} | {_cell(r['frage'])} | {r['ergebnis']} |\n"
+        yield "\n### ❓ Quiz-Antworten\n\n| Zeit | Frage | Antwort | Ergebnis |\n|---|---|---|---|\n"
+        for r in history(store, deck, user_id, kinds=("quiz_answered",)):
+            yield f"| {r['zeit']} | {_cell(r['frage'])} | {_cell(r['antwort'])} | {r['ergebnis']} |\n"
+
+
+CHUNKS = {"csv": csv_chunks, "json": json_chunks, "markdown": markdown_chunks}
+
+
+def export_file(store, deck, user_ids, fmt):
+    """Render the report into a temporary file and return it, rewound, for reading."""
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode="w+b")
+    for chunk in CHUNKS[fmt](store, deck, user_ids):
+        out.write(chunk.encode("utf-8"))
+    out.seek(0)
+    return out
+
+
+def export_bytes(store, deck, user_ids, fmt):
+    """The report as bytes, for ``st.download_button``, which takes no file objects but its own."""
+    with export_file(store, deck, user_ids, fmt) as report:
+        return report.read()
+
+
+def file_name(fmt, label):
+    return f"lernfortschritt_{label}_{datetime.now().strftime('%Y%m%d')}.{FORMATS[fmt][1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", type=Path,
+                        default=Path(os.environ.get("LERNEN_PROGRESS_DB", "data/progress.sqlite")))
+    parser.add_argument("--deck", type=Path, default=Path(os.environ.get("LERNEN_DECK", "decks/somatoforme.json")))
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--users", nargs="+", help="user ids (default: everyone who learned this deck)")
+    parser.add_argument("--out", type=Path, help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    store = ProgressStore(args.db)
+    deck = DeckStore(ensure_deck(args.deck))
+    try:
+        default_deck = Path(os.environ.get("LERNEN_DECK", "decks/somatoforme.json")).stem
+        user_ids = args.users or deck_users(store.user_ids(), args.deck.stem, default_deck)
+        report = export_file(store, deck, user_ids, args.format)
+        with report:
+            if args.out is None:
+                shutil.copyfileobj(report, sys.stdout.buffer)
+            else:
+                with open(args.out, "wb") as f:
+                    shutil.copyfileobj(report, f)
+    finally:
+        store.close()
+        deck.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Opt-in timing of app sections, aggregated into per-process histograms.
+
+Enabled with ``LERNEN_METRICS=1``. When disabled, ``section`` returns a
+shared no-op context manager and ``timed`` returns the function unchanged,
+so instrumented code pays for one function call at most.
+"""
+import contextlib
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from pathlib import Path
+
+ENABLED = os.environ.get("LERNEN_METRICS", "") not in ("", "0")
+METRICS_FILE = Path(os.environ.get("LERNEN_METRICS_FILE", Path(__file__).parent / "data" / "metrics.prom"))
+DUMP_INTERVAL = 10.0  # seconds between Prometheus dumps
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # upper bounds, seconds
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_histograms = {}
+_last_dump = 0.0
+_NOOP = contextlib.nullcontext()
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-quantile, like Prometheus' histogram_quantile
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+def observe(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+class _Section:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+
+
+def section(name):
+    return _Section(name) if ENABLED else _NOOP
+
+
+def timed(name):
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def summary():
+    """``[(name, count, mean, p50, p95, p99)]`` in seconds, slowest total first."""
+    with _lock:
+        rows = [
+            (name, h.count, h.sum / h.count, h.quantile(0.5), h.quantile(0.95), h.quantile(0.99), h.sum)
+            for name, h in _histograms.items()
+        ]
+    rows.sort(key=lambda row: row[-1], reverse=True)
+    return [row[:-1] for row in rows]
+
+
+def prometheus_text():
+    lines = [
+        "# HELP lernen_section_seconds Time spent in a section of lernen.py",
+        "# TYPE lernen_section_seconds histogram",
+    ]
+    with _lock:
+        for name, h in sorted(_histograms.items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), h.counts):
+                cumulative += count
+                lines.append(f'lernen_section_seconds_bucket{{section="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'lernen_section_seconds_sum{{section="{label}"}} {h.sum}')
+            lines.append(f'lernen_section_seconds_count{{section="{label}"}} {h.count}')
+    return "\n".join(lines) + "\n"
+
+
+def maybe_dump(path=METRICS_FILE, interval=DUMP_INTERVAL):
+    # Called at the end of every run; rewrites the dump file at most every ``interval`` seconds
+    global _last_dump
+    if not ENABLED:
+        return
+    now = time.monotonic()
+    with _lock:
+        if now - _last_dump < interval:
+            return
+        _last_dump = now
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(prometheus_text(), encoding="utf-8")
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.exception("Writing metrics to %s failed", path)
@@ -1,707 +1,930 @@
+import time
+_run_started = time.perf_counter()
+
 import streamlit as st
+import os
 import random
-import time
+import uuid
+from array import array
 from datetime import datetime, timedelta
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
+from functools import partial
+from pathlib import Path
+import achievements
+import export
+import templates
+from deck_registry import MAX_OPEN_DECKS, DeckRegistry, progress_key
+from prefetch import Prefetcher
+from progress_store import ProgressStore
+from quiz_engine import QuizEngine, shuffled
+from scheduler import RATINGS, Scheduler
+from search_index import FLASHCARD, QUIZ, SearchIndex
+from session_snapshot import SessionSnapshot, deck_digest
+from time_tracker import TimeTracker, format_duration
+import instrumentation
+import startup
+from instrumentation import section, timed
+from startup import lazy_import
+
+# Only Mindmap, Quiz and Statistiken need these; Karteikarten and Memory never load them
+HEAVY_IMPORTS = ("plotly.graph_objects", "mindmap", "pandas", "plotly.express", "distractors", "analytics")
+
+# Lerninhalt Datenbank
+DECK_DIR = os.environ.get("LERNEN_DECK_DIR", str(Path(__file__).parent / "decks"))
+DECK_PATH = os.environ.get("LERNEN_DECK", str(Path(DECK_DIR) / "somatoforme.json"))
+MAX_OPEN_DECKS = int(os.environ.get("LERNEN_MAX_DECKS", MAX_OPEN_DECKS))
+DECK_MEMORY_LIMIT = int(os.environ["LERNEN_DECK_MEMORY_MB"]) << 20 if os.environ.get("LERNEN_DECK_MEMORY_MB") else None
+
+@st.cache_resource
+def load_registry(directory, default_path):
+    # One registry per process; every deck in it is opened once and shared by all sessions
+    return DeckRegistry(directory, default_path, MAX_OPEN_DECKS, DECK_MEMORY_LIMIT)
+
+registry = load_registry(DECK_DIR, DECK_PATH)
+
+# The deck lives in the URL next to the user id; unknown or deleted decks fall back to the default
+if st.session_state.get("deck_name") not in registry:
+    requested = st.query_params.get("deck")
+    st.session_state.deck_name = requested if requested in registry else registry.default
+deck_name = st.session_state.deck_name
+deck = registry.open(deck_name)
 
 # Page config
 st.set_page_config(
-    page_title="Somatoforme Störungen Lernapp",
+    page_title=f"{deck.title} Lernapp",
     page_icon="🧠",
     layout="wide",
     initial_sidebar_state="expanded"
 )
 
 # Custom CSS für ADHS-freundliches Design
-st.markdown("""
-<style>
-    .stApp {
-        background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-    }
-    
-    .flashcard {
-        background: white;
-        padding: 40px;
-        border-radius: 20px;
-        box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
-        text-align: center;
-        min-height: 300px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        margin: 20px 0;
-        transition: all 0.3s ease;
-        cursor: pointer;
-    }
-    
-    .flashcard:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 15px 40px rgba(0, 0, 0, 0.15);
-    }
-    
-    .flashcard h2 {
-        color: #667eea;
-        margin-bottom: 20px;
-    }
-    
-    .flashcard p {
-        font-size: 1.2em;
-        line-height: 1.6;
-        color: #4a5568;
-    }
-    
-    .quiz-option {
-        background: #f7fafc;
-        padding: 15px 20px;
-        border-radius: 10px;
-        margin: 10px 0;
-        border: 2px solid transparent;
-        transition: all 0.3s ease;
-        cursor: pointer;
-    }
-    
-    .quiz-option:hover {
-        background: #e2e8f0;
-        transform: translateX(5px);
-    }
-    
-    .correct {
-        background: #c6f6d5 !important;
-        border-color: #48bb78 !important;
-    }
-    
-    .incorrect {
-        background: #fed7d7 !important;
-        border-color: #f56565 !important;
-    }
-    
-    .achievement {
-        background: white;
-        padding: 20px;
-        border-radius: 15px;
-        box-shadow: 0 5px 20px rgba(0, 0, 0, 0.1);
-        margin: 20px 0;
-        border-left: 4px solid #667eea;
-    }
-    
-    .memory-card {
-        background: linear-gradient(135deg, #667eea, #764ba2);
-        color: white;
-        padding: 20px;
-        border-radius: 15px;
-        text-align: center;
-        min-height: 120px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        font-weight: bold;
-    }
-    
-    .memory-card:hover {
-        transform: scale(1.05);
-    }
-    
-    .memory-card.flipped {
-        background: white;
-        color: #4a5568;
-        border: 2px solid #e2e8f0;
-    }
-    
-    .memory-card.matched {
-        background: #e2e8f0;
-        color: #718096;
-        cursor: default;
-        opacity: 0.7;
-    }
-    
-    .stProgress > div > div {
-        background-color: linear-gradient(135deg, #667eea, #764ba2);
-    }
-    
-    .stat-card {
-        background: white;
-        padding: 20px;
-        border-radius: 15px;
-        text-align: center;
-        box-shadow: 0 5px 15px rgba(0, 0, 0, 0.08);
+with section("css"):
+    st.markdown(templates.STYLESHEET, unsafe_allow_html=True)
+
+# Lernfortschritt Datenbank
+PROGRESS_DB = os.environ.get("LERNEN_PROGRESS_DB", str(Path(__file__).parent / "data" / "progress.sqlite"))
+
+@st.cache_resource
+def load_progress_store(path):
+    return ProgressStore(path)
+
+progress_store = load_progress_store(PROGRESS_DB)
+
+@st.cache_resource
+def load_prefetcher():
+    return Prefetcher()
+
+prefetcher = load_prefetcher()
+
+def current_user():
+    # The user id lives in the URL, so a bookmark or reload finds the same progress again
+    user_id = st.query_params.get("u")
+    if not user_id:
+        user_id = uuid.uuid4().hex
+        st.query_params["u"] = user_id
+    return user_id
+
+def progress_snapshot():
+    return {
+        "cards_studied": sorted(st.session_state.cards_studied),
+        "quiz_score": st.session_state.quiz_score,
+        "quiz_source": st.session_state.quiz_source,
+        "quiz_engines": {source: engine.to_dict() for source, engine in st.session_state.quiz_engines.items()},
+        "quiz_choice": st.session_state.quiz_choice,
+        "quiz_completed": st.session_state.quiz_completed,
+        "memory_moves": st.session_state.memory_moves,
+        "memory_completed": st.session_state.memory_completed,
+        "memory_round_size": st.session_state.memory_round_size,
+        "memory_columns": st.session_state.memory_columns,
+        "progress": st.session_state.progress,
+        "start_time": st.session_state.start_time.isoformat(),
+        "time": st.session_state.time_tracker.to_dict(),
+        "achievements": [
+            {"title": a["title"], "description": a["description"], "time": a["time"].isoformat()}
+            for a in st.session_state.achievements
+        ],
+        "scheduler": st.session_state.scheduler.to_dict(),
     }
-    
-    .stat-card h3 {
-        color: #667eea;
-        margin-bottom: 10px;
+
+def quiz_bank_size(source):
+    # Generated questions are numbered like the flashcards they come from
+    return deck.flashcard_count() if source == "karten" else deck.quiz_count()
+
+def restore_progress(snapshot):
+    card_count = deck.flashcard_count()
+    st.session_state.cards_studied = {i for i in snapshot["cards_studied"] if i < card_count}
+    st.session_state.quiz_score = snapshot["quiz_score"]
+    # Snapshots from before generated quizzes hold a single engine under "quiz"
+    engines = snapshot.get("quiz_engines") or ({"deck": snapshot["quiz"]} if "quiz" in snapshot else {})
+    st.session_state.quiz_source = snapshot.get("quiz_source", "deck")
+    st.session_state.quiz_engines = {
+        source: QuizEngine.from_dict(data, quiz_bank_size(source)) for source, data in engines.items()
     }
-</style>
-""", unsafe_allow_html=True)
+    st.session_state.quiz_choice = snapshot["quiz_choice"]
+    st.session_state.quiz_answered = snapshot["quiz_choice"] is not None
+    st.session_state.quiz_completed = snapshot["quiz_completed"]
+    st.session_state.memory_moves = snapshot["memory_moves"]
+    st.session_state.memory_completed = snapshot["memory_completed"]
+    st.session_state.memory_round_size = snapshot.get("memory_round_size", 8)
+    st.session_state.memory_columns = snapshot.get("memory_columns", 4)
+    st.session_state.progress = snapshot["progress"]
+    st.session_state.start_time = datetime.fromisoformat(snapshot["start_time"])
+    if "time" in snapshot:
+        st.session_state.time_tracker = TimeTracker.from_dict(snapshot["time"])
+    st.session_state.achievements = [
+        {"title": a["title"], "description": a["description"], "time": datetime.fromisoformat(a["time"])}
+        for a in snapshot["achievements"]
+    ]
+    st.session_state.unlocked = {achievements.RENAMED.get(a["title"], a["title"]) for a in st.session_state.achievements}
+    st.session_state.scheduler = Scheduler.from_dict(snapshot["scheduler"], card_count)
+
+def log_event(kind, **payload):
+    # Buffered in memory; the snapshot is staged once per run in save_progress()
+    progress_store.record(st.session_state.user_id, kind, payload)
+    st.session_state.progress_dirty = True
+
+def track(kind, item_id=None):
+    # Dwell times reach the event log in batches, not once per interaction
+    batch = st.session_state.time_tracker.focus(kind, item_id, time.time())
+    if batch:
+        log_event("dwell", items=batch)
+
+def current_session_token():
+    # One token per browser tab, kept in the URL, so a reconnect after a restart finds the tab's view again
+    token = st.query_params.get("s")
+    if not token:
+        token = uuid.uuid4().hex
+        st.query_params["s"] = token
+    return token
+
+def session_view():
+    mode = st.session_state.get("mode")
+    return SessionSnapshot(
+        deck_version=deck_digest(deck.version),
+        mode=list(MODES).index(mode) if mode in MODES else 0,
+        card_flipped=st.session_state.card_flipped,
+        card=st.session_state.scheduler.current,
+        memory_round=tuple(st.session_state.memory_round),
+        memory_layout=tuple(st.session_state.memory_layout),
+        memory_matched=st.session_state.memory_matched,
+        memory_open=st.session_state.memory_open,
+        memory_page=st.session_state.memory_page,
+    )
+
+def restore_session(data):
+    try:
+        view = SessionSnapshot.from_bytes(data)
+    except ValueError:
+        return
+    # A board dealt from another deck version may point at pairs that are gone
+    if view.deck_version != deck_digest(deck.version) or any(
+        pair_id >= deck.memory_pair_count() for pair_id in view.memory_round
+    ):
+        return
+    st.session_state.restored_mode = view.mode
+    # The current card comes from the progress snapshot, which may be older than this view
+    st.session_state.card_flipped = view.card_flipped and view.card == st.session_state.scheduler.current
+    st.session_state.memory_round = array("I", view.memory_round)
+    st.session_state.memory_layout = array("I", view.memory_layout)
+    st.session_state.memory_matched = view.memory_matched
+    # A wrong pair that was about to be hidden stays hidden
+    st.session_state.memory_open = view.memory_open if len(view.memory_open) == 1 else ()
+    st.session_state.memory_page = view.memory_page
+    st.session_state.session_bytes = data
+
+def save_session():
+    # Encoding takes microseconds; only a changed view is handed to the writer
+    data = session_view().to_bytes()
+    if data != st.session_state.session_bytes:
+        progress_store.save_session(st.session_state.session_token, st.session_state.user_id, data)
+        st.session_state.session_bytes = data
+
+def save_progress():
+    if st.session_state.progress_dirty:
+        progress_store.save_snapshot(st.session_state.user_id, progress_snapshot())
+        st.session_state.progress_dirty = False
+    save_session()
+
+# Widgets whose values belong to one deck's session
+DECK_WIDGET_KEYS = ("quiz_source_choice", "memory_round_choice", "memory_columns_choice",
+                    "memory_page_choice", "retention_card")
+
+def switch_deck():
+    # Save the old deck's progress; the next run initializes the session for the new one
+    batch = st.session_state.time_tracker.drain(time.time())
+    if batch:
+        log_event("dwell", items=batch)
+    save_progress()
+    for key in DECK_WIDGET_KEYS:
+        st.session_state.pop(key, None)
+    st.session_state.deck_name = st.session_state.deck_choice
+    st.query_params["deck"] = st.session_state.deck_choice
 
-# Initialize session state
-if 'initialized' not in st.session_state:
-    st.session_state.initialized = True
-    st.session_state.current_card = 0
+# Initialize session state, again whenever another deck is picked
+if st.session_state.get("initialized") != deck_name:
+    st.session_state.initialized = deck_name
+    st.session_state.scheduler = Scheduler(deck.flashcard_count())
     st.session_state.card_flipped = False
+    st.session_state.quiz_source = "deck"
+    st.session_state.quiz_engines = {}
     st.session_state.quiz_score = 0
-    st.session_state.quiz_current = 0
     st.session_state.quiz_answered = False
-    st.session_state.memory_cards = []
-    st.session_state.memory_flipped = []
-    st.session_state.memory_matched = []
+    st.session_state.quiz_choice = None
+    st.session_state.memory_round_size = 8
+    st.session_state.memory_columns = 4
+    st.session_state.memory_round = array("I")
+    st.session_state.memory_layout = array("I")
+    st.session_state.memory_matched = 0
+    st.session_state.memory_open = ()
+    st.session_state.memory_page = 0
     st.session_state.memory_moves = 0
+    st.session_state.memory_hide_at = None
     st.session_state.achievements = []
+    st.session_state.unlocked = set()
+    st.session_state.celebrations = []
+    st.session_state.sidebar_stale = False
     st.session_state.progress = 0
     st.session_state.start_time = datetime.now()
+    st.session_state.time_tracker = TimeTracker()
     st.session_state.cards_studied = set()
     st.session_state.quiz_completed = False
     st.session_state.memory_completed = False
-
-# Lerninhalt Datenbank
-flashcards = [
-    {
-        "question": "Somatisierungsstörung",
-        "answer": "Multiple und häufig wechselnde körperliche Symptome (mindestens 6 Symptome) über mehr als 2 Jahre ohne ausreichende somatische Erklärung"
-    },
-    {
-        "question": "Hypochondrische Störung",
-        "answer": "Anhaltende Überzeugung vom Vorhandensein einer oder mehrerer ernsthafter körperlicher Erkrankungen (Dauer: 6 Monate) oder anhaltende Beschäftigung mit einer vermuteten Entstellung"
-    },
-    {
-        "question": "Somatoforme autonome Funktionsstörung",
-        "answer": "Symptome eines vegetativ innervierten Organs (kardiovaskulär, respiratorisch, gastrointestinal) + vegetative Dysregulation + intensive Beschäftigung mit vermuteter Erkrankung"
-    },
-    {
-        "question": "Anhaltende somatoforme Schmerzstörung",
-        "answer": "Anhaltender, schwerer und quälender Schmerz ohne ausreichende Erklärung durch physiologische Prozesse, tritt in Verbindung mit emotionalen/psychosozialen Belastungen auf"
-    },
-    {
-        "question": "ICD-11: Körperliche Belastungsstörung",
-        "answer": "Körperliche Symptome + übermäßige Aufmerksamkeit + wiederholte Kontakte mit Gesundheitsdienstleistern + Persistenz über mehrere Monate"
-    },
-    {
-        "question": "DSM-5: Somatic Symptom Disorder (SSD)",
-        "answer": "Belastende somatische Symptome + exzessive Gedanken/Gefühle/Verhalten bezüglich der Symptome + Chronizität >6 Monate"
-    },
-    {
-        "question": "Illness Anxiety Disorder (DSM-5)",
-        "answer": "Sorge vor ernsthafter Erkrankung + keine/milde Symptome + starke Angst + exzessive gesundheitsbezogene Aktivitäten + 6 Monate"
-    },
-    {
-        "question": "Conversion Disorder (DSM-5)",
-        "answer": "Gestörte motorische oder sensorische Funktion ohne neurologischen Zusammenhang + deutliches Leiden und Einschränkungen"
-    },
-    {
-        "question": "Wichtige Warnung (Cave!)",
-        "answer": "Iatrogene Fixierung und Chronifizierung durch wiederholte Untersuchungen trotz negativer Befunde vermeiden!"
-    },
-    {
-        "question": "7 Screening-Symptome",
-        "answer": "Erbrechen, Unterleibsschmerzen, Übelkeit, Blähungen, Diarrhoe, Speisen-Unverträglichkeit, Schmerzen - 2+ Symptome zeigen hohe Wahrscheinlichkeit"
-    }
-]
-
-quiz_questions = [
-    {
-        "question": "Wie lange müssen die Symptome bei einer Somatisierungsstörung mindestens bestehen?",
-        "options": ["6 Monate", "1 Jahr", "2 Jahre", "3 Jahre"],
-        "correct": 2,
-        "explanation": "Bei der Somatisierungsstörung müssen die Symptome über mehr als 2 Jahre bestehen."
-    },
-    {
-        "question": "Wie viele Symptome sind für eine Somatisierungsstörung mindestens erforderlich?",
-        "options": ["3 Symptome", "4 Symptome", "5 Symptome", "6 Symptome"],
-        "correct": 3,
-        "explanation": "Für die Diagnose einer Somatisierungsstörung sind mindestens 6 Symptome erforderlich."
-    },
-    {
-        "question": "Was ist KEIN Synonym für funktionelle Störungen?",
-        "options": ["Psychovegetative Störung", "Vegetative Dystonie", "Bipolare Störung", "Organneurose"],
-        "correct": 2,
-        "explanation": "Bipolare Störung ist eine affektive Störung und kein Synonym für funktionelle Störungen."
-    },
-    {
-        "question": "Welche Dauer gilt für die Hypochondrische Störung?",
-        "options": ["3 Monate", "6 Monate", "12 Monate", "24 Monate"],
-        "correct": 1,
-        "explanation": "Die Hypochondrische Störung muss mindestens 6 Monate bestehen."
-    },
-    {
-        "question": "Was charakterisiert die Conversion Disorder?",
-        "options": ["Nur Schmerzen", "Gestörte motorische/sensorische Funktion", "Nur Angst", "Nur vegetative Symptome"],
-        "correct": 1,
-        "explanation": "Die Conversion Disorder ist durch gestörte motorische oder sensorische Funktionen charakterisiert."
-    },
-    {
-        "question": "Welches Organsystem ist NICHT typisch für die somatoforme autonome Funktionsstörung?",
-        "options": ["Kardiovaskulär", "Respiratorisch", "Gastrointestinal", "Muskuloskeletal"],
-        "correct": 3,
-        "explanation": "Das muskuloskeletale System ist nicht typisch für die somatoforme autonome Funktionsstörung."
-    },
-    {
-        "question": "Was ist die Mindestanzahl von Screening-Symptomen für eine hohe Wahrscheinlichkeit?",
-        "options": ["1 Symptom", "2 Symptome", "3 Symptome", "4 Symptome"],
-        "correct": 1,
-        "explanation": "2 oder mehr der 7 kursiven Screening-Symptome zeigen eine hohe Wahrscheinlichkeit an."
-    },
-    {
-        "question": "Welche Störung wurde früher als hypochondrische Störung bezeichnet?",
-        "options": ["Somatic Symptom Disorder", "Illness Anxiety Disorder", "Conversion Disorder", "Factitious Disorder"],
-        "correct": 1,
-        "explanation": "Die Illness Anxiety Disorder (DSM-5) entspricht der früheren hypochondrischen Störung."
-    }
-]
-
-memory_pairs = [
-    ("Somatisierung", ">2 Jahre, 6+ Symptome"),
-    ("Hypochondrie", "6 Monate Krankheitsangst"),
-    ("Autonome Störung", "Vegetative Symptome"),
-    ("Schmerzstörung", "Quälender Schmerz"),
-    ("ICD-11", "Körperliche Belastung"),
-    ("DSM-5 SSD", "Exzessive Gedanken"),
-    ("Conversion", "Motor./sensor. Störung"),
-    ("Cave!", "Iatrogene Fixierung")
-]
+    st.session_state.progress_dirty = False
+    
+    # Restore saved progress with a single indexed read
+    st.session_state.user_id = progress_key(current_user(), deck_name, registry.default)
+    saved_progress = progress_store.load(st.session_state.user_id)
+    if saved_progress:
+        restore_progress(saved_progress)
+    
+    # The tab's own view (turned card, Memory board) from before a server restart
+    st.session_state.session_token = current_session_token()
+    st.session_state.session_bytes = None
+    saved_session = progress_store.load_session(st.session_state.session_token, st.session_state.user_id)
+    if saved_session:
+        restore_session(saved_session)
 
 # Helper Functions
+achievement_engine = achievements.AchievementEngine()
+
 def add_achievement(title, description):
-    achievement = {"title": title, "description": description, "time": datetime.now()}
-    if title not in [a["title"] for a in st.session_state.achievements]:
-        st.session_state.achievements.append(achievement)
-        st.success(f"🏆 Achievement freigeschaltet: {title}")
-        st.balloons()
+    if title in st.session_state.unlocked:
+        return
+    st.session_state.unlocked.add(title)
+    st.session_state.achievements.append({"title": title, "description": description, "time": datetime.now()})
+    # Shown on the next full run, together with the updated sidebar
+    st.session_state.celebrations.append(title)
+    st.session_state.sidebar_stale = True
+    log_event("achievement", title=title)
 
-def update_progress():
-    # Calculate progress based on activities
-    card_progress = len(st.session_state.cards_studied) / len(flashcards) * 30
-    quiz_progress = (st.session_state.quiz_score / len(quiz_questions) * 35) if st.session_state.quiz_completed else 0
-    memory_progress = 35 if st.session_state.memory_completed else 0
-    
-    st.session_state.progress = min(100, card_progress + quiz_progress + memory_progress)
-    
-    # Check for achievements
-    if st.session_state.progress >= 25 and st.session_state.progress < 50:
-        add_achievement("Erste Schritte", "25% Fortschritt erreicht!")
-    elif st.session_state.progress >= 50 and st.session_state.progress < 75:
-        add_achievement("Halbzeit", "50% Fortschritt erreicht!")
-    elif st.session_state.progress >= 75 and st.session_state.progress < 100:
-        add_achievement("Fast geschafft", "75% Fortschritt erreicht!")
-    elif st.session_state.progress >= 100:
-        add_achievement("Meister der Somatoformen Störungen", "100% abgeschlossen!")
+def emit(event, **context):
+    # Only the rules subscribed to this event are checked
+    for title, description in achievement_engine.evaluate(event, st.session_state.unlocked, **context):
+        add_achievement(title, description)
 
-# Sidebar
-with st.sidebar:
-    st.title("🧠 Somatoforme Störungen")
-    st.markdown("### Lernapp für Medizinstudierende")
-    
-    # Progress
-    st.markdown("---")
-    st.markdown("### 📊 Dein Fortschritt")
-    progress_bar = st.progress(st.session_state.progress / 100)
-    st.write(f"{st.session_state.progress:.0f}% abgeschlossen")
-    
-    # Study time
-    study_time = datetime.now() - st.session_state.start_time
-    st.write(f"⏱️ Lernzeit: {study_time.seconds // 60} Minuten")
-    
-    # Achievements
-    st.markdown("---")
-    st.markdown("### 🏆 Achievements")
-    if st.session_state.achievements:
-        for achievement in st.session_state.achievements[-3:]:  # Show last 3
-            st.markdown(f"**{achievement['title']}**")
-            st.caption(achievement['description'])
-    else:
-        st.info("Noch keine Achievements freigeschaltet")
+@timed("update_progress")
+def update_progress():
+    shown_progress = round(st.session_state.progress)
     
-    # Navigation
-    st.markdown("---")
-    st.markdown("### 🎯 Lernmodus wählen")
-    mode = st.radio(
-        "Wähle deinen Lernmodus:",
-        ["📇 Karteikarten", "🕸️ Mindmap", "❓ Quiz", "🎮 Memory-Spiel", "📈 Statistiken"],
-        label_visibility="collapsed"
-    )
+    # Calculate progress based on activities; imported decks may lack some kinds of content,
+    # those count towards neither the progress nor the total
+    card_count = deck.flashcard_count()
+    parts = [
+        (30, len(st.session_state.cards_studied) / card_count if card_count else None),
+        (35, quiz_percentage() / 100 if deck.quiz_count() or card_count > 1 else None),
+        (35, float(st.session_state.memory_completed) if deck.memory_pair_count() else None),
+    ]
+    weight = sum(w for w, share in parts if share is not None)
+    progress = min(100, sum(w * share for w, share in parts if share is not None) / weight * 100) if weight else 0
+    if progress == st.session_state.progress:
+        return
+    st.session_state.progress = progress
+    if round(progress) != shown_progress:
+        st.session_state.sidebar_stale = True
+    emit(achievements.PROGRESS_CHANGED, progress=progress, deck=deck.title)
 
-# Main content
-st.title("🧠 Somatoforme Störungen Lernapp")
-st.markdown("*ADHS-freundlich gestaltet mit visuellen Elementen und Gamification*")
+def sync_session():
+    save_progress()
+    
+    # Fragment reruns leave the sidebar alone; redraw the whole app only when its numbers changed
+    if st.session_state.sidebar_stale:
+        st.rerun()
 
 # Karteikarten Mode
-if mode == "📇 Karteikarten":
+PREFETCH_CARDS = 2  # upcoming cards rendered in the background while the current one is read
+
+def card_templates():
+    return registry.derived(deck_name, "templates", templates.CardTemplates)
+
+def rate_card(rating):
+    scheduler = st.session_state.scheduler
+    st.session_state.cards_studied.add(scheduler.current)
+    log_event("card_rated", card=scheduler.current, rating=rating)
+    scheduler.rate(rating)
+    st.session_state.card_flipped = False
+    update_progress()
+    emit(achievements.CARD_RATED, studied=len(st.session_state.cards_studied), total=deck.flashcard_count())
+
+def warm_card(card_html, card_id):
+    card_html.front(card_id)
+    card_html.back(card_id)
+
+def navigate_card(action, *args):
+    action(*args)
+    st.session_state.card_flipped = False
+    st.session_state.progress_dirty = True
+
+@st.fragment
+@timed("mode:karteikarten")
+def show_flashcards():
+    sync_session()
+    
     st.header("📇 Karteikarten")
-    st.write("Klicke auf die Karte zum Umdrehen!")
+    st.write("Dreh die Karte um und bewerte, wie gut du die Antwort wusstest!")
+    
+    scheduler = st.session_state.scheduler
+    scheduler.card_count = deck.flashcard_count()
+    if scheduler.current is None:
+        scheduler.advance()
+    if scheduler.current is None:
+        st.info("Dieses Deck enthält noch keine Karteikarten.")
+        return
+    track("card", scheduler.current)
     
     col1, col2, col3 = st.columns([1, 3, 1])
     
     with col1:
-        if st.button("⬅️ Zurück", use_container_width=True):
-            st.session_state.current_card = (st.session_state.current_card - 1) % len(flashcards)
-            st.session_state.card_flipped = False
+        st.button("⬅️ Zurück", width="stretch", disabled=not scheduler.history,
+                  on_click=navigate_card, args=(scheduler.back,))
     
     with col2:
-        current_card = flashcards[st.session_state.current_card]
+        card_html = card_templates()
         
         # Flip button
-        if st.button("🔄 Karte umdrehen", use_container_width=True):
+        if st.button("🔄 Karte umdrehen", width="stretch"):
             st.session_state.card_flipped = not st.session_state.card_flipped
-            st.session_state.cards_studied.add(st.session_state.current_card)
-            update_progress()
+            save_session()
         
         # Display card
         if not st.session_state.card_flipped:
-            st.markdown(f"""
-            <div class="flashcard">
-                <div>
-                    <h2>{current_card['question']}</h2>
-                    <p style="color: #718096; margin-top: 30px;">Klicke zum Umdrehen</p>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(card_html.front(scheduler.current), unsafe_allow_html=True)
         else:
-            st.markdown(f"""
-            <div class="flashcard">
-                <div>
-                    <h3 style="color: #667eea;">{current_card['question']}</h3>
-                    <p>{current_card['answer']}</p>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(card_html.back(scheduler.current), unsafe_allow_html=True)
+            
+            # Rating replaces the bare flip: it schedules the card and moves on
+            rating_cols = st.columns(len(RATINGS))
+            for rating, label in RATINGS.items():
+                with rating_cols[rating]:
+                    st.button(label, key=f"rate_{rating}", width="stretch",
+                              on_click=rate_card, args=(rating,))
     
     with col3:
-        if st.button("Weiter ➡️", use_container_width=True):
-            st.session_state.current_card = (st.session_state.current_card + 1) % len(flashcards)
-            st.session_state.card_flipped = False
-            
-            # Check if all cards viewed
-            if len(st.session_state.cards_studied) == len(flashcards):
-                add_achievement("Kartei-Meister", "Alle Karteikarten durchgearbeitet!")
+        st.button("Weiter ➡️", width="stretch",
+                  on_click=navigate_card, args=(scheduler.skip,))
     
     # Progress indicator
-    st.markdown(f"**Karte {st.session_state.current_card + 1} von {len(flashcards)}**")
+    card_state = scheduler.state(scheduler.current)
+    if card_state is None:
+        st.markdown(f"**Karte {scheduler.current + 1} von {deck.flashcard_count()}** · neu")
+    else:
+        st.markdown(f"**Karte {scheduler.current + 1} von {deck.flashcard_count()}** · "
+                    f"Intervall {card_state.interval:.0f} Tag(e) · Leichtigkeit {card_state.ease:.2f}")
     
     # Quick navigation
     st.markdown("---")
     st.markdown("### 🎯 Schnellzugriff")
+    upcoming = scheduler.upcoming(5)
     quick_nav_cols = st.columns(5)
-    for i in range(min(5, len(flashcards))):
+    for i, card_id in enumerate(upcoming):
         with quick_nav_cols[i]:
-            if st.button(f"Karte {i+1}", key=f"quick_{i}"):
-                st.session_state.current_card = i
-                st.session_state.card_flipped = False
+            st.button(f"Karte {card_id + 1}", key=f"quick_{i}",
+                      on_click=navigate_card, args=(scheduler.jump, card_id))
+    
+    # Rating or "Weiter" usually shows the first upcoming card; have it rendered by then
+    for card_id in upcoming[:PREFETCH_CARDS]:
+        prefetcher.submit((deck_name, deck.version, "card", card_id), warm_card, card_html, card_id)
 
 # Mindmap Mode
-elif mode == "🕸️ Mindmap":
+def build_mindmap(store):
+    with section("plotly_figure:mindmap"):
+        return lazy_import("mindmap").build_figure(store.mindmap_nodes())
+
+@timed("mode:mindmap")
+def show_mindmap():
+    track("mindmap")
     st.header("🕸️ Interaktive Mindmap")
-    st.write("Erkunde die Zusammenhänge zwischen den verschiedenen somatoformen Störungen!")
-    
-    # Create interactive mindmap with Plotly
-    fig = go.Figure()
-    
-    # Central node
-    fig.add_trace(go.Scatter(
-        x=[0], y=[0],
-        mode='markers+text',
-        marker=dict(size=80, color='#667eea'),
-        text=['Somatoforme<br>Störungen'],
-        textposition="middle center",
-        textfont=dict(size=16, color='white'),
-        hoverinfo='text',
-        hovertext='Zentrale Kategorie aller somatoformen Störungen'
-    ))
-    
-    # Sub-nodes
-    nodes = [
-        ("Somatisierungsstörung", ">2 Jahre, 6+ Symptome"),
-        ("Hypochondrische Störung", "6 Monate Krankheitsangst"),
-        ("Autonome Funktionsstörung", "Vegetative Symptome"),
-        ("Schmerzstörung", "Quälender Schmerz"),
-        ("ICD-11: Körperliche Belastung", "Übermäßige Aufmerksamkeit"),
-        ("DSM-5: SSD", "Exzessive Gedanken"),
-        ("Illness Anxiety", "Sorge vor Erkrankung"),
-        ("Conversion Disorder", "Motor./sensor. Störung")
-    ]
+    st.write(f"Erkunde die Zusammenhänge im Thema {deck.title}!")
     
-    import math
-    for i, (title, desc) in enumerate(nodes):
-        angle = 2 * math.pi * i / len(nodes)
-        x = 3 * math.cos(angle)
-        y = 3 * math.sin(angle)
-        
-        # Add connection line
-        fig.add_trace(go.Scatter(
-            x=[0, x], y=[0, y],
-            mode='lines',
-            line=dict(color='#e2e8f0', width=2),
-            hoverinfo='skip',
-            showlegend=False
-        ))
-        
-        # Add node
-        fig.add_trace(go.Scatter(
-            x=[x], y=[y],
-            mode='markers+text',
-            marker=dict(size=60, color='white', line=dict(color='#667eea', width=3)),
-            text=[f"{title}<br><span style='font-size:10px'>{desc}</span>"],
-            textposition="middle center",
-            textfont=dict(size=12),
-            hoverinfo='text',
-            hovertext=f"{title}: {desc}",
-            showlegend=False
-        ))
-    
-    fig.update_layout(
-        height=600,
-        showlegend=False,
-        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=0, r=0, t=0, b=0)
-    )
+    fig = registry.derived(deck_name, "mindmap", build_mindmap)
+    with section("plotly_chart"):
+        st.plotly_chart(fig, width="stretch")
     
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Info boxes
-    col1, col2 = st.columns(2)
-    with col1:
-        st.info("💡 **Tipp**: Alle Störungen haben gemeinsam, dass körperliche Symptome ohne ausreichende somatische Erklärung auftreten.")
-    with col2:
-        st.warning("⚠️ **Cave**: Iatrogene Fixierung und Chronifizierung vermeiden!")
+    # Info boxes, if the deck has any
+    tip, warning = deck.meta("tip"), deck.meta("warning")
+    if tip or warning:
+        col1, col2 = st.columns(2)
+        if tip:
+            col1.info(f"💡 **Tipp**: {tip}")
+        if warning:
+            col2.warning(f"⚠️ **Cave**: {warning}")
 
 # Quiz Mode
-elif mode == "❓ Quiz":
+QUIZ_SOURCES = {"deck": "📝 Quizfragen", "karten": "📇 Aus Karteikarten"}
+
+def build_distractor_index(store):
+    return lazy_import("distractors").DistractorIndex.from_deck(store)
+
+def load_distractor_index():
+    return registry.derived(deck_name, "distractors", build_distractor_index)
+
+def quiz_question(source, question_id):
+    if source == "karten":
+        return load_distractor_index().question(question_id)
+    return deck.quiz_question(question_id)
+
+def active_quiz():
+    # One engine per question source, created on first use
+    source = st.session_state.quiz_source
+    engine = st.session_state.quiz_engines.get(source)
+    if engine is None:
+        engine = st.session_state.quiz_engines[source] = QuizEngine(quiz_bank_size(source))
+    return engine
+
+def start_quiz_session():
+    # Questions drawn by past error rate, each with a random option order
+    source = st.session_state.quiz_source
+    active_quiz().start_session(lambda q: len(quiz_question(source, q)['options']))
+
+def current_quiz_question():
+    question_id, permutation = active_quiz().current()
+    return question_id, shuffled(quiz_question(st.session_state.quiz_source, question_id), permutation)
+
+def quiz_percentage():
+    # Share of the finished session answered correctly, 0 while it is still running
+    session_length = len(active_quiz().session)
+    if not st.session_state.quiz_completed or not session_length:
+        return 0
+    return st.session_state.quiz_score / session_length * 100
+
+def answer_quiz(i):
+    question_id, current_q = current_quiz_question()
+    correct = i == current_q['correct']
+    st.session_state.quiz_answered = True
+    st.session_state.quiz_choice = i
+    active_quiz().record(question_id, correct)
+    # The log keeps the option's position in the deck, not the shuffled one
+    if st.session_state.quiz_source == "karten":
+        log_event("quiz_answered", source="karten", question=question_id,
+                  choice_card=current_q['option_cards'][current_q['order'][i]], correct=correct)
+    else:
+        log_event("quiz_answered", question=question_id, choice=current_q['order'][i], correct=correct)
+    if correct:
+        st.session_state.quiz_score += 1
+    emit(achievements.QUIZ_ANSWERED, correct=correct)
+
+def next_quiz_question():
+    active_quiz().advance()
+    st.session_state.quiz_answered = False
+    st.session_state.quiz_choice = None
+    st.session_state.progress_dirty = True
+
+def restart_quiz():
+    log_event("quiz_restarted")
+    start_quiz_session()
+    st.session_state.quiz_score = 0
+    st.session_state.quiz_answered = False
+    st.session_state.quiz_choice = None
+    st.session_state.quiz_completed = False
+
+def switch_quiz_source():
+    st.session_state.quiz_source = st.session_state.quiz_source_choice
+    restart_quiz()
+
+@st.fragment
+@timed("mode:quiz")
+def show_quiz():
+    sync_session()
+    
     st.header("❓ Interaktives Quiz")
-    st.write("Teste dein Wissen über somatoforme Störungen!")
+    st.write(f"Teste dein Wissen über {deck.title}!")
     
-    if st.session_state.quiz_current < len(quiz_questions):
-        current_q = quiz_questions[st.session_state.quiz_current]
+    # Generated questions need at least one other card as a distractor
+    if deck.flashcard_count() > 1:
+        st.radio("Fragenquelle", list(QUIZ_SOURCES), format_func=QUIZ_SOURCES.get, horizontal=True,
+                 index=list(QUIZ_SOURCES).index(st.session_state.quiz_source),
+                 key="quiz_source_choice", on_change=switch_quiz_source)
+    
+    quiz = active_quiz()
+    quiz.resize(quiz_bank_size(st.session_state.quiz_source))
+    if not quiz.session:
+        start_quiz_session()
+    if not quiz.session:
+        st.info("Dieses Deck enthält noch keine Quizfragen.")
+        return
+    
+    if not quiz.finished:
+        question_id, current_q = current_quiz_question()
+        track("generated_quiz" if st.session_state.quiz_source == "karten" else "quiz", question_id)
         
-        st.markdown(f"### Frage {st.session_state.quiz_current + 1} von {len(quiz_questions)}")
+        st.markdown(f"### Frage {quiz.position + 1} von {len(quiz.session)}")
         st.markdown(f"**{current_q['question']}**")
+        error_rate = quiz.error_rate(question_id)
+        if error_rate is not None:
+            st.caption(f"Bisher zu {error_rate:.0%} falsch beantwortet")
         
         # Display options
         for i, option in enumerate(current_q['options']):
             col1, col2 = st.columns([0.1, 0.9])
             with col1:
-                if st.button(f"{chr(65+i)}", key=f"opt_{i}", disabled=st.session_state.quiz_answered):
-                    st.session_state.quiz_answered = True
-                    if i == current_q['correct']:
-                        st.success("✅ Richtig!")
-                        st.session_state.quiz_score += 1
-                        add_achievement("Quiz-Talent", "Erste richtige Antwort!")
-                    else:
-                        st.error(f"❌ Leider falsch. Richtig wäre: {current_q['options'][current_q['correct']]}")
-                    st.info(f"💡 {current_q['explanation']}")
+                st.button(f"{chr(65+i)}", key=f"opt_{i}", disabled=st.session_state.quiz_answered,
+                          on_click=answer_quiz, args=(i,))
             with col2:
                 st.write(option)
         
         if st.session_state.quiz_answered:
-            if st.button("Nächste Frage ➡️", type="primary"):
-                st.session_state.quiz_current += 1
-                st.session_state.quiz_answered = False
-                st.rerun()
+            # Feedback comes from session state, so it survives the sidebar refresh
+            if st.session_state.quiz_choice == current_q['correct']:
+                st.success("✅ Richtig!")
+            else:
+                st.error(f"❌ Leider falsch. Richtig wäre: {current_q['options'][current_q['correct']]}")
+            st.info(f"💡 {current_q['explanation']}")
+            
+            st.button("Nächste Frage ➡️", type="primary", on_click=next_quiz_question)
+        
+        # Fetch (or generate) the next question while this one is read
+        if quiz.position + 1 < len(quiz.session):
+            next_id, _ = quiz.session[quiz.position + 1]
+            source = st.session_state.quiz_source
+            fetch = load_distractor_index().question if source == "karten" else deck.quiz_question
+            prefetcher.submit((deck_name, deck.version, source, next_id), fetch, next_id)
     
     else:
         # Quiz completed
-        st.session_state.quiz_completed = True
-        update_progress()
+        track("quiz")
+        if not st.session_state.quiz_completed:
+            st.session_state.quiz_completed = True
+            log_event("quiz_completed", score=st.session_state.quiz_score, total=len(quiz.session))
+            emit(achievements.QUIZ_COMPLETED, percentage=quiz_percentage())
+            update_progress()
+        percentage = quiz_percentage()
         
         st.success(f"🎉 Quiz abgeschlossen!")
-        st.markdown(f"### Dein Ergebnis: {st.session_state.quiz_score}/{len(quiz_questions)} Punkten")
-        
-        percentage = (st.session_state.quiz_score / len(quiz_questions)) * 100
-        if percentage == 100:
-            add_achievement("Perfektionist", "100% im Quiz erreicht!")
-            st.balloons()
-        elif percentage >= 80:
-            add_achievement("Quiz-Experte", "Über 80% im Quiz erreicht!")
+        st.markdown(f"### Dein Ergebnis: {st.session_state.quiz_score}/{len(quiz.session)} Punkten")
         
         # Results visualization
-        fig = go.Figure(go.Indicator(
-            mode = "gauge+number+delta",
-            value = percentage,
-            title = {'text': "Erfolgsquote"},
-            delta = {'reference': 70},
-            gauge = {
-                'axis': {'range': [None, 100]},
-                'bar': {'color': "#667eea"},
-                'steps': [
-                    {'range': [0, 50], 'color': "#fed7d7"},
-                    {'range': [50, 80], 'color': "#fef3c7"},
-                    {'range': [80, 100], 'color': "#c6f6d5"}
-                ],
-                'threshold': {
-                    'line': {'color': "red", 'width': 4},
-                    'thickness': 0.75,
-                    'value': 90
+        with section("plotly_figure:quiz"):
+            go = lazy_import("plotly.graph_objects")
+            fig = go.Figure(go.Indicator(
+                mode = "gauge+number+delta",
+                value = percentage,
+                title = {'text': "Erfolgsquote"},
+                delta = {'reference': 70},
+                gauge = {
+                    'axis': {'range': [None, 100]},
+                    'bar': {'color': "#667eea"},
+                    'steps': [
+                        {'range': [0, 50], 'color': "#fed7d7"},
+                        {'range': [50, 80], 'color': "#fef3c7"},
+                        {'range': [80, 100], 'color': "#c6f6d5"}
+                    ],
+                    'threshold': {
+                        'line': {'color': "red", 'width': 4},
+                        'thickness': 0.75,
+                        'value': 90
+                    }
                 }
-            }
-        ))
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+            ))
+            fig.update_layout(height=400)
+        with section("plotly_chart"):
+            st.plotly_chart(fig, width="stretch")
         
-        if st.button("Quiz wiederholen 🔄"):
-            st.session_state.quiz_current = 0
-            st.session_state.quiz_score = 0
-            st.session_state.quiz_answered = False
-            st.session_state.quiz_completed = False
-            st.rerun()
+        st.button("Quiz wiederholen 🔄", on_click=restart_quiz)
+    
+    sync_session()
 
 # Memory Game Mode
-elif mode == "🎮 Memory-Spiel":
+MEMORY_REVEAL_SECONDS = 1.0
+MEMORY_ROUND_SIZES = (4, 6, 8, 12, 16, 24, 32)  # pairs per round
+MEMORY_COLUMN_CHOICES = (3, 4, 5, 6, 8)
+MEMORY_PAGE_ROWS = 6
+
+def memory_round_size():
+    return min(st.session_state.memory_round_size, deck.memory_pair_count())
+
+def memory_pairs_found():
+    return st.session_state.memory_matched.bit_count() // 2
+
+def memory_page_range():
+    page_size = st.session_state.memory_columns * MEMORY_PAGE_ROWS
+    start = st.session_state.memory_page * page_size
+    return range(start, min(start + page_size, len(st.session_state.memory_layout)))
+
+def deal_memory():
+    # A round samples its pairs from the pool, so setup cost depends on the round size only
+    size = memory_round_size()
+    st.session_state.memory_round = array("I", random.sample(range(deck.memory_pair_count()), size))
+    # Layout values encode the round's pair slot (value // 2) and side (value % 2)
+    st.session_state.memory_layout = array("I", random.sample(range(2 * size), 2 * size))
+    st.session_state.memory_matched = 0
+    st.session_state.memory_open = ()
+    st.session_state.memory_page = 0
+
+def memory_card_html(value, state):
+    return card_templates().memory_card(st.session_state.memory_round[value >> 1], value & 1, state)
+
+def hide_memory_mismatch(force=False):
+    # Flip a wrong pair back once its reveal deadline has passed (or right away when forced)
+    hide_at = st.session_state.memory_hide_at
+    if hide_at is None or (not force and time.time() < hide_at):
+        return False
+    st.session_state.memory_open = ()
+    st.session_state.memory_hide_at = None
+    return True
+
+@st.fragment(run_every=MEMORY_REVEAL_SECONDS / 2)
+def memory_reveal_timer():
+    # Polled by the browser while a wrong pair is visible, so no server thread has to sleep
+    if hide_memory_mismatch():
+        st.rerun()
+
+def flip_memory_card(i):
+    # Card clicks skip show_memory, so the time is booked here
+    track("memory")
+    # A new click closes a still visible wrong pair immediately
+    changed = list(st.session_state.memory_open)
+    counters_changed = hide_memory_mismatch(force=True)
+    if not counters_changed:
+        changed = []
+    
+    # Flip card
+    open_cards = st.session_state.memory_open + (i,)
+    st.session_state.memory_open = open_cards
+    changed.append(i)
+    
+    if len(open_cards) == 2:
+        counters_changed = True
+        changed.append(open_cards[0])
+        st.session_state.memory_moves += 1
+        idx1, idx2 = open_cards
+        layout, pairs = st.session_state.memory_layout, st.session_state.memory_round
+        slot1, slot2 = layout[idx1] >> 1, layout[idx2] >> 1
+        matched = slot1 == slot2
+        log_event("memory_move", pairs=[pairs[slot1], pairs[slot2]], matched=matched)
+        
+        # Check for match
+        if matched:
+            st.session_state.memory_matched |= (1 << idx1) | (1 << idx2)
+            st.session_state.memory_open = ()
+            
+            # Check if game completed
+            if st.session_state.memory_matched == (1 << len(layout)) - 1:
+                st.session_state.memory_completed = True
+                log_event("memory_completed", moves=st.session_state.memory_moves)
+                update_progress()
+                emit(achievements.MEMORY_COMPLETED, moves=st.session_state.memory_moves)
+        else:
+            # No match - flip back after the reveal deadline
+            st.session_state.memory_hide_at = time.time() + MEMORY_REVEAL_SECONDS
+    
+    # Rerun only the cards that changed (and the counters after a move); the rest of the board stays as sent
+    page = memory_page_range()
+    scopes = [f"memory_card_{j}" for j in set(changed) if j in page]
+    if counters_changed:
+        scopes.append("memory_stats")
+    else:
+        # Without memory_stats no sync_session runs; the open card still belongs in the session view
+        save_session()
+    if scopes:
+        st.rerun(scopes)
+
+def restart_memory():
+    log_event("memory_restarted")
+    st.session_state.memory_layout = array("I")
+    st.session_state.memory_matched = 0
+    st.session_state.memory_open = ()
+    st.session_state.memory_moves = 0
+    st.session_state.memory_hide_at = None
+    st.session_state.memory_completed = False
+
+def set_memory_round_size():
+    st.session_state.memory_round_size = st.session_state.memory_round_choice
+    restart_memory()
+
+def set_memory_columns():
+    # Keep the first card of the current page in view
+    first = memory_page_range().start
+    st.session_state.memory_columns = st.session_state.memory_columns_choice
+    st.session_state.memory_page = first // (st.session_state.memory_columns * MEMORY_PAGE_ROWS)
+
+def set_memory_page():
+    # Clicking the selected page again deselects it; stay where we are (the selector is reset below)
+    if st.session_state.memory_page_choice is not None:
+        st.session_state.memory_page = st.session_state.memory_page_choice - 1
+
+@st.fragment(key="memory_stats")
+def memory_stats():
+    sync_session()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Züge", st.session_state.memory_moves)
+    with col2:
+        st.metric("Gefundene Paare", f"{memory_pairs_found()}/{len(st.session_state.memory_round)}")
+    
+    hide_memory_mismatch()
+    if st.session_state.memory_hide_at is not None:
+        memory_reveal_timer()
+
+def memory_card(i):
+    value = st.session_state.memory_layout[i]
+    if st.session_state.memory_matched >> i & 1:
+        st.markdown(memory_card_html(value, "matched"), unsafe_allow_html=True)
+    elif i in st.session_state.memory_open:
+        st.markdown(memory_card_html(value, "flipped"), unsafe_allow_html=True)
+    else:
+        st.button("?", key=f"mem_{i}", width="stretch",
+                  on_click=flip_memory_card, args=(i,))
+
+@st.fragment
+@timed("mode:memory")
+def show_memory():
+    sync_session()
+    
     st.header("🎮 Memory-Spiel")
     st.write("Finde die passenden Paare von Begriffen und ihren Definitionen!")
     
-    # Initialize memory game
-    if not st.session_state.memory_cards:
-        cards = []
-        for i, (term, definition) in enumerate(memory_pairs):
-            cards.append({"id": i, "content": term, "type": "term"})
-            cards.append({"id": i, "content": definition, "type": "definition"})
-        random.shuffle(cards)
-        st.session_state.memory_cards = cards
-        st.session_state.memory_flipped = [False] * len(cards)
-        st.session_state.memory_matched = [False] * len(cards)
-    
-    # Game stats
+    track("memory")
+    if not deck.memory_pair_count():
+        st.info("Dieses Deck enthält noch keine Memory-Paare.")
+        return
+    if not st.session_state.memory_layout:
+        deal_memory()
+    
+    # Board settings
+    pool = deck.memory_pair_count()
+    sizes = [n for n in MEMORY_ROUND_SIZES if n < pool] + ([pool] if pool <= MEMORY_ROUND_SIZES[-1] else [])
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Züge", st.session_state.memory_moves)
+        if len(sizes) > 1:
+            st.select_slider("Paare pro Runde", sizes, value=memory_round_size(),
+                             key="memory_round_choice", on_change=set_memory_round_size)
     with col2:
-        matches = sum(st.session_state.memory_matched) // 2
-        st.metric("Gefundene Paare", f"{matches}/{len(memory_pairs)}")
+        st.select_slider("Spalten", MEMORY_COLUMN_CHOICES, value=st.session_state.memory_columns,
+                         key="memory_columns_choice", on_change=set_memory_columns)
     with col3:
-        if st.button("Neu starten 🔄"):
-            st.session_state.memory_cards = []
-            st.session_state.memory_flipped = []
-            st.session_state.memory_matched = []
-            st.session_state.memory_moves = 0
-            st.session_state.memory_completed = False
-            st.rerun()
-    
-    # Display cards in grid
-    cols = st.columns(4)
-    for i, card in enumerate(st.session_state.memory_cards):
-        with cols[i % 4]:
-            if st.session_state.memory_matched[i]:
-                st.markdown(f"""
-                <div class="memory-card matched">
-                    {card['content']}
-                </div>
-                """, unsafe_allow_html=True)
-            elif st.session_state.memory_flipped[i]:
-                st.markdown(f"""
-                <div class="memory-card flipped">
-                    {card['content']}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                if st.button("?", key=f"mem_{i}", 
-                           disabled=st.session_state.memory_matched[i] or st.session_state.memory_flipped[i],
-                           use_container_width=True):
-                    
-                    # Flip card
-                    st.session_state.memory_flipped[i] = True
-                    flipped_indices = [j for j, f in enumerate(st.session_state.memory_flipped) 
-                                     if f and not st.session_state.memory_matched[j]]
-                    
-                    if len(flipped_indices) == 2:
-                        st.session_state.memory_moves += 1
-                        idx1, idx2 = flipped_indices
-                        card1, card2 = st.session_state.memory_cards[idx1], st.session_state.memory_cards[idx2]
-                        
-                        # Check for match
-                        if card1['id'] == card2['id'] and card1['type'] != card2['type']:
-                            st.session_state.memory_matched[idx1] = True
-                            st.session_state.memory_matched[idx2] = True
-                            
-                            # Check if game completed
-                            if all(st.session_state.memory_matched):
-                                st.session_state.memory_completed = True
-                                update_progress()
-                                add_achievement("Memory-Meister", f"Alle Paare in {st.session_state.memory_moves} Zügen gefunden!")
-                                st.balloons()
-                        else:
-                            # No match - flip back after delay
-                            time.sleep(1)
-                            st.session_state.memory_flipped[idx1] = False
-                            st.session_state.memory_flipped[idx2] = False
-                    
-                    st.rerun()
+        st.button("Neu starten 🔄", on_click=restart_memory)
+    
+    memory_stats()
+    
+    # Large boards are shown a page at a time
+    columns = st.session_state.memory_columns
+    page_count = -(-len(st.session_state.memory_layout) // (columns * MEMORY_PAGE_ROWS))
+    if page_count > 1:
+        # Dealing, restarting and changing the columns move the page too; the selector follows
+        st.session_state.memory_page_choice = st.session_state.memory_page + 1
+        st.segmented_control("Seite", range(1, page_count + 1), key="memory_page_choice",
+                             on_change=set_memory_page)
+    
+    # Every card is its own fragment, so a click reruns just the cards it changed
+    page = memory_page_range()
+    cols = st.columns(columns)
+    for i in page:
+        with cols[(i - page.start) % columns]:
+            st.fragment(key=f"memory_card_{i}")(memory_card)(i)
 
 # Statistics Mode
-elif mode == "📈 Statistiken":
+EXPORT_LABELS = {"csv": "CSV", "json": "JSON", "markdown": "Markdown"}
+QUIZ_SOURCE_LABELS = {"deck": "Quiz", "karten": "Karte"}
+RETENTION_CARD_CHOICES = 100
+DWELL_LABELS = {
+    "card": "Karteikarten",
+    "quiz": "Quiz",
+    "generated_quiz": "Quiz aus Karteikarten",
+    "memory": "Memory",
+    "mindmap": "Mindmap",
+    "statistics": "Statistiken",
+}
+
+@st.cache_resource(max_entries=256)
+def load_analytics(user_id):
+    # Running aggregates per user; each view only adds the events logged since the last one
+    return lazy_import("analytics").LearningAnalytics(user_id)
+
+def card_label(card_id):
+    try:
+        return f"Karte {card_id + 1}: {deck.flashcard(card_id)['question']}"
+    except IndexError:
+        return f"Karte {card_id + 1}"
+
+def question_text(source, question_id):
+    try:
+        if source == "karten":
+            return deck.flashcard(question_id)["question"]
+        return deck.quiz_question(question_id)["question"]
+    except IndexError:
+        return f"Frage {question_id + 1}"
+
+@timed("mode:statistiken")
+def show_statistics():
+    track("statistics")
     st.header("📈 Deine Lernstatistiken")
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.markdown("""
-        <div class="stat-card">
-            <h3>📇</h3>
-            <h2>{}/{}</h2>
-            <p>Karten gelernt</p>
-        </div>
-        """.format(len(st.session_state.cards_studied), len(flashcards)), unsafe_allow_html=True)
+        st.markdown(templates.stat_card(
+            "📇", f"{len(st.session_state.cards_studied)}/{deck.flashcard_count()}", "Karten gelernt"
+        ), unsafe_allow_html=True)
     
     with col2:
-        quiz_percentage = (st.session_state.quiz_score / len(quiz_questions) * 100) if st.session_state.quiz_completed else 0
-        st.markdown(f"""
-        <div class="stat-card">
-            <h3>❓</h3>
-            <h2>{quiz_percentage:.0f}%</h2>
-            <p>Quiz-Erfolg</p>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(templates.stat_card("❓", f"{quiz_percentage():.0f}%", "Quiz-Erfolg"), unsafe_allow_html=True)
     
     with col3:
-        matches = sum(st.session_state.memory_matched) // 2 if st.session_state.memory_matched else 0
-        st.markdown(f"""
-        <div class="stat-card">
-            <h3>🎮</h3>
-            <h2>{matches}/{len(memory_pairs)}</h2>
-            <p>Memory Paare</p>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(templates.stat_card(
+            "🎮", f"{memory_pairs_found()}/{memory_round_size()}", "Memory Paare"
+        ), unsafe_allow_html=True)
     
     with col4:
-        st.markdown(f"""
-        <div class="stat-card">
-            <h3>🏆</h3>
-            <h2>{len(st.session_state.achievements)}</h2>
-            <p>Achievements</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    # Progress over time chart
+        st.markdown(templates.stat_card("🏆", len(st.session_state.achievements), "Achievements"),
+                    unsafe_allow_html=True)
+    
+    # Analytics over the whole event history
     st.markdown("---")
     st.subheader("📊 Lernfortschritt")
     
-    # Create sample progress data
-    progress_data = pd.DataFrame({
-        'Bereich': ['Karteikarten', 'Quiz', 'Memory', 'Gesamt'],
-        'Fortschritt': [
-            len(st.session_state.cards_studied) / len(flashcards) * 100,
-            quiz_percentage,
-            (matches / len(memory_pairs) * 100) if len(memory_pairs) > 0 else 0,
-            st.session_state.progress
-        ]
-    })
-    
-    fig = px.bar(progress_data, x='Bereich', y='Fortschritt', 
-                 color='Fortschritt', color_continuous_scale='viridis',
-                 title='Fortschritt nach Lernbereich')
-    fig.update_layout(showlegend=False, yaxis_range=[0, 100])
-    st.plotly_chart(fig, use_container_width=True)
+    # Events still in the write-behind buffer belong in the charts, but are not written from here
+    until_id, pending = progress_store.unflushed(st.session_state.user_id)
+    stats = load_analytics(st.session_state.user_id).update(progress_store, until_id=until_id).including(pending)
+    if stats.empty:
+        st.info("Noch keine Lernaktivität aufgezeichnet. Bewerte ein paar Karteikarten oder beantworte Quizfragen!")
+    else:
+        px = lazy_import("plotly.express")
+        daily = stats.daily()
+        tab_progress, tab_time, tab_retention, tab_questions = st.tabs(
+            ["📈 Verlauf", "⏱️ Lernzeit", "🧠 Behalten", "❓ Quizfragen"]
+        )
+        with tab_progress:
+            with section("plotly_figure:statistiken"):
+                fig = px.line(daily, y=["cards_total", "accuracy"], markers=True,
+                              labels={"index": "Tag", "value": "", "variable": ""},
+                              title="Gelernte Karten und Quiz-Trefferquote (%) pro Tag")
+                fig.for_each_trace(lambda t: t.update(name={"cards_total": "Karten gelernt",
+                                                            "accuracy": "Quiz richtig (%)"}[t.name]))
+            with section("plotly_chart"):
+                st.plotly_chart(fig, width="stretch")
+        with tab_time:
+            with section("plotly_figure:statistiken"):
+                fig = px.bar(daily, y="minutes", labels={"index": "Tag", "minutes": "Minuten"},
+                             title="Lernzeit pro Tag")
+            with section("plotly_chart"):
+                st.plotly_chart(fig, width="stretch")
+            by_kind = stats.time_by_kind()
+            if not by_kind.empty:
+                st.caption(" · ".join(f"{DWELL_LABELS.get(kind, kind)}: {format_duration(seconds)}"
+                                      for kind, seconds in by_kind.items()))
+            slowest = stats.slowest_items("card", limit=10)
+            if not slowest.empty:
+                st.markdown("**Karten mit der längsten Bedenkzeit**")
+                st.dataframe(
+                    {
+                        "Karte": [card_label(card) for card in slowest["item"]],
+                        "Aufrufe": slowest["views"].astype(int),
+                        "Ø Sekunden": slowest["mean_active"].round().astype(int),
+                    },
+                    hide_index=True, width="stretch",
+                )
+        with tab_retention:
+            cards = stats.reviewed_cards(limit=RETENTION_CARD_CHOICES)
+            card = st.selectbox("Karte", [None, *cards], key="retention_card",
+                                format_func=lambda c: "Alle Karten" if c is None else card_label(c))
+            curve = stats.retention_curve(card)
+            with section("plotly_figure:statistiken"):
+                fig = px.line(curve, y="rate", markers=True, range_y=[0, 105],
+                              labels={"interval": "Abstand zur letzten Wiederholung", "rate": "gewusst (%)"},
+                              title="Behaltensquote nach Wiederholungsabstand", hover_data=["reviews"])
+            with section("plotly_chart"):
+                st.plotly_chart(fig, width="stretch")
+        with tab_questions:
+            errors = stats.question_errors(limit=10)
+            if errors.empty:
+                st.info("Noch keine Quizfragen beantwortet.")
+            else:
+                st.dataframe(
+                    {
+                        "Frage": [question_text(src, q) for src, q in zip(errors["source"], errors["question"])],
+                        "Quelle": errors["source"].map(QUIZ_SOURCE_LABELS),
+                        "Antworten": errors["answered"].astype(int),
+                        "Fehlerquote": errors["error_rate"].round().astype(int).astype(str) + " %",
+                    },
+                    hide_index=True, width="stretch",
+                )
     
     # Learning tips
     st.markdown("---")
     st.subheader("💡 Personalisierte Lerntipps")
     
-    if len(st.session_state.cards_studied) < len(flashcards) / 2:
+    if len(st.session_state.cards_studied) < deck.flashcard_count() / 2:
         st.info("📇 **Karteikarten**: Du hast erst wenige Karten durchgearbeitet. Versuche täglich 3-5 Karten zu lernen!")
     
-    if st.session_state.quiz_completed and quiz_percentage < 70:
+    if st.session_state.quiz_completed and quiz_percentage() < 70:
         st.warning("❓ **Quiz**: Wiederhole das Quiz, um dein Wissen zu festigen. Ziel: mindestens 70%!")
     
     if not st.session_state.memory_completed:
@@ -738,35 +961,158 @@ elif mode == "📈 Statistiken":
     
     # Export option
     st.markdown("---")
-    if st.button("📥 Lernfortschritt exportieren", type="primary"):
-        summary = f"""
-# Lernfortschritt Somatoforme Störungen
-## Datum: {datetime.now().strftime('%d.%m.%Y %H:%M')}
-
-### 📊 Statistiken
-- Karteikarten gelernt: {len(st.session_state.cards_studied)}/{len(flashcards)}
-- Quiz-Erfolg: {quiz_percentage:.0f}%
-- Memory Paare gefunden: {matches}/{len(memory_pairs)}
-- Gesamtfortschritt: {st.session_state.progress:.0f}%
-- Lernzeit: {(datetime.now() - st.session_state.start_time).seconds // 60} Minuten
-
-### 🏆 Achievements ({len(st.session_state.achievements)})
-"""
-        for achievement in st.session_state.achievements:
-            summary += f"\n- {achievement['title']}: {achievement['description']}"
-        
-        st.download_button(
-            label="Download als Textdatei",
-            data=summary,
-            file_name=f"lernfortschritt_somatoforme_{datetime.now().strftime('%Y%m%d')}.txt",
-            mime="text/plain"
-        )
+    st.subheader("📥 Lernfortschritt exportieren")
+    export_format = st.radio("Format", list(export.FORMATS), format_func=EXPORT_LABELS.get,
+                             horizontal=True, key="export_format")
+    # Generated only when the download is clicked, from the event log
+    st.download_button(
+        label="Download",
+        data=partial(export.export_bytes, progress_store, deck, [st.session_state.user_id], export_format),
+        file_name=export.file_name(export_format, deck_name),
+        mime=export.FORMATS[export_format][0],
+        on_click="ignore",
+        type="primary",
+    )
+
+# Suche
+SEARCH_LIMIT = 10
+
+def load_search_index():
+    return registry.derived(deck_name, "search", SearchIndex.from_deck)
+
+def open_search_hit(card_id):
+    st.session_state.mode = "📇 Karteikarten"
+    navigate_card(st.session_state.scheduler.jump, card_id)
+    st.session_state.search_query = ""
+
+def show_search_results(query):
+    hits = load_search_index().search(query, limit=SEARCH_LIMIT)
+    with st.expander(f"🔍 Suchergebnisse für „{query}“", expanded=True):
+        if not hits:
+            st.info("Keine Treffer gefunden.")
+        for hit in hits:
+            if hit.kind == FLASHCARD:
+                card = deck.flashcard(hit.item_id)
+                st.button(f"📇 {card['question']}", key=f"hit_{hit.item_id}",
+                          on_click=open_search_hit, args=(hit.item_id,))
+            elif hit.kind == QUIZ:
+                question = deck.quiz_question(hit.item_id)
+                st.markdown(f"❓ **{question['question']}**")
+                st.caption(f"Richtig: {question['options'][question['correct']]}")
+            else:
+                term, definition = deck.memory_pair(hit.item_id)
+                st.markdown(f"🎮 **{term}** – {definition}")
+
+# Messwerte (only with LERNEN_METRICS=1, opened via ?admin=metrics)
+def show_metrics():
+    st.header("⏱️ Messwerte")
+    st.caption(f"Prometheus-Datei: {instrumentation.METRICS_FILE}")
+    rows = instrumentation.summary()
+    if not rows:
+        st.info("Noch keine Messwerte.")
+        return
+    st.table([
+        {
+            "Abschnitt": name,
+            "Aufrufe": count,
+            "Mittel (ms)": f"{mean * 1000:.1f}",
+            "p50 ≤ ms": f"{p50 * 1000:g}",
+            "p95 ≤ ms": f"{p95 * 1000:g}",
+            "p99 ≤ ms": f"{p99 * 1000:g}",
+        }
+        for name, count, mean, p50, p95, p99 in rows
+    ])
+
+MODES = {
+    "📇 Karteikarten": show_flashcards,
+    "🕸️ Mindmap": show_mindmap,
+    "❓ Quiz": show_quiz,
+    "🎮 Memory-Spiel": show_memory,
+    "📈 Statistiken": show_statistics,
+}
+
+# Sidebar
+save_progress()
+st.session_state.sidebar_stale = False
+with section("sidebar"), st.sidebar:
+    st.title(f"🧠 {deck.title}")
+    st.markdown("### Lernapp")
+    
+    # Deck picker; each deck keeps its own progress
+    deck_names = registry.names()
+    if len(deck_names) > 1:
+        st.selectbox("📚 Deck", deck_names, index=deck_names.index(deck_name), format_func=registry.title,
+                     key="deck_choice", on_change=switch_deck)
+    
+    # Progress
+    st.markdown("---")
+    st.markdown("### 📊 Dein Fortschritt")
+    progress_bar = st.progress(st.session_state.progress / 100)
+    st.write(f"{st.session_state.progress:.0f}% abgeschlossen")
+    
+    # Study time: active time only, pauses are counted apart
+    tracker = st.session_state.time_tracker
+    st.write(f"⏱️ Lernzeit: {format_duration(tracker.active)}")
+    if tracker.idle >= 60:
+        st.caption(f"Pausen: {format_duration(tracker.idle)}")
+    
+    # Achievements
+    st.markdown("---")
+    st.markdown("### 🏆 Achievements")
+    if st.session_state.achievements:
+        for achievement in st.session_state.achievements[-3:]:  # Show last 3
+            st.markdown(f"**{achievement['title']}**")
+            st.caption(achievement['description'])
+    else:
+        st.info("Noch keine Achievements freigeschaltet")
+    
+    # Navigation
+    st.markdown("---")
+    st.markdown("### 🎯 Lernmodus wählen")
+    if "restored_mode" in st.session_state:
+        # Set before the radio exists; restored session views only know the mode's position
+        restored_mode = st.session_state.pop("restored_mode")
+        if restored_mode < len(MODES):
+            st.session_state.mode = list(MODES)[restored_mode]
+    mode = st.radio(
+        "Wähle deinen Lernmodus:",
+        list(MODES),
+        key="mode",
+        label_visibility="collapsed"
+    )
+    
+    # Search
+    st.markdown("---")
+    search_query = st.text_input("🔍 Suche", key="search_query", placeholder="Begriff eingeben…")
+
+# Achievements unlocked since the last full run
+if st.session_state.celebrations:
+    for title in st.session_state.celebrations:
+        st.toast(f"🏆 Achievement freigeschaltet: {title}")
+    st.balloons()
+    st.session_state.celebrations = []
+
+# Main content
+st.title(f"🧠 {deck.title} Lernapp")
+st.markdown("*ADHS-freundlich gestaltet mit visuellen Elementen und Gamification*")
+
+if instrumentation.ENABLED and st.query_params.get("admin") == "metrics":
+    show_metrics()
+else:
+    if search_query.strip():
+        show_search_results(search_query)
+    MODES[mode]()
 
 # Footer with tips
 st.markdown("---")
-st.markdown("""
-<div style='text-align: center; color: #718096;'>
-    <p>💡 <strong>ADHS-Tipp</strong>: Mache alle 25 Minuten eine 5-Minuten-Pause (Pomodoro-Technik)</p>
-    <p>🎯 Setze dir kleine, erreichbare Ziele und feiere deine Erfolge!</p>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(templates.FOOTER, unsafe_allow_html=True)
+
+# Cold-start measurement
+if startup.first_run is None:
+    startup.record_run(time.perf_counter() - _run_started)
+    if os.environ.get("LERNEN_PRELOAD"):
+        startup.preload(HEAVY_IMPORTS)
+
+if instrumentation.ENABLED:
+    instrumentation.observe("run", time.perf_counter() - _run_started)
+    instrumentation.maybe_dump()
@@ -0,0 +1,634 @@
+"""Offline deck bundle: one static HTML file that runs Karteikarten, Quiz and Memory in the browser.
+
+Example::
+
+    python offline_bundle.py build --deck decks/somatoforme.json --out somatoforme.html \\
+        --sync-url http://lernen.example.org:8502/sync
+    python offline_bundle.py serve --deck decks/somatoforme.json --port 8502
+
+``build`` writes the deck (flashcards, quiz questions, memory pairs), the
+card styling and the client code into a single file. Flipping, rating,
+answering and turning memory cards never leave the browser; the resulting
+events queue up in ``localStorage`` and are posted to the sync URL in
+batches whenever the browser is online. ``serve`` hands out the bundle and
+takes those batches into the progress database, so they show up in the
+app's statistics and exports like events from the app itself.
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from deck_registry import progress_key
+from deck_store import DeckStore, ensure_deck
+from progress_store import ProgressStore, well_formed
+from quiz_engine import SESSION_SIZE
+from scheduler import (DAY, EASY_BONUS, HARD_FACTOR, MIN_EASE, QUALITY, RATINGS, RELEARN_DELAY, START_EASE,
+                       Scheduler)
+from styles import CARD_CSS
+from templates import minify_css
+
+SYNC_INTERVAL = 30  # seconds between sync attempts while events are waiting
+SYNC_BATCH_SIZE = 200  # events per request
+MAX_BODY = 1 << 20  # larger sync requests are refused
+MEMORY_ROUND_SIZES = (4, 6, 8, 12, 16, 24, 32)  # as in lernen.py
+MEMORY_REVEAL_MS = 1000
+SYNC_KINDS = ("card_rated", "quiz_answered", "quiz_completed", "memory_move", "memory_completed")
+
+# Layout for what Streamlit draws itself in the app: navigation, buttons, grid
+BUNDLE_CSS = """
+    body {
+        font-family: "Source Sans Pro", system-ui, sans-serif;
+        margin: 0;
+        color: #2d3748;
+    }
+
+    main {
+        max-width: 900px;
+        margin: 0 auto;
+        padding: 20px;
+    }
+
+    nav, .row {
+        display: flex;
+        gap: 10px;
+        flex-wrap: wrap;
+        margin: 10px 0;
+    }
+
+    button {
+        padding: 8px 16px;
+        border: 1px solid #cbd5e0;
+        border-radius: 8px;
+        background: white;
+        font-size: 1em;
+        cursor: pointer;
+    }
+
+    button.active, button.primary {
+        background: #667eea;
+        border-color: #667eea;
+        color: white;
+    }
+
+    button:disabled {
+        opacity: 0.5;
+        cursor: default;
+    }
+
+    .quiz-option {
+        width: 100%;
+        text-align: left;
+    }
+
+    .memory-grid {
+        display: grid;
+        grid-template-columns: repeat(4, 1fr);
+        gap: 10px;
+    }
+
+    .sync {
+        color: #718096;
+        font-size: 0.9em;
+    }
+"""
+
+CLIENT_JS = r"""
+"use strict";
+const DECK = JSON.parse(document.getElementById("deck").textContent);
+const SM2 = DECK.scheduler;
+const STATE_KEY = "lernen:" + DECK.version;
+
+function newId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID().replace(/-/g, "");
+    return Array.from({length: 32}, () => Math.floor(Math.random() * 16).toString(16)).join("");
+}
+
+function stored(key, make) {
+    let value = localStorage.getItem(key);
+    if (!value) {
+        value = make();
+        localStorage.setItem(key, value);
+    }
+    return value;
+}
+
+// Same user id as the app when the bundle is opened with ?u=...
+const USER = new URLSearchParams(location.search).get("u") || stored("lernen:user", newId);
+const DEVICE = stored("lernen:device", newId);
+let state = JSON.parse(localStorage.getItem(STATE_KEY) || "null") || {
+    cards: {}, nextNew: 0, current: null, seq: 0, queue: [], memoryRoundSize: 8,
+};
+
+function save() {
+    localStorage.setItem(STATE_KEY, JSON.stringify(state));
+}
+
+function now() {
+    return Date.now() / 1000;
+}
+
+function log(kind, payload) {
+    state.seq += 1;
+    state.queue.push([state.seq, now(), kind, payload]);
+    save();
+    if (state.queue.length >= DECK.sync.batch_size) sync();
+    else renderSync();
+}
+
+// Sync: events leave the queue only once the server confirmed them
+let syncing = false;
+
+function syncBody(events) {
+    return JSON.stringify({user: USER, device: DEVICE, version: DECK.version, events: events});
+}
+
+async function sync() {
+    if (!DECK.sync.url || syncing || !navigator.onLine || !state.queue.length) return;
+    syncing = true;
+    try {
+        // text/plain keeps it a simple request: no CORS preflight from file://
+        const response = await fetch(DECK.sync.url, {
+            method: "POST",
+            headers: {"Content-Type": "text/plain"},
+            body: syncBody(state.queue.slice(0, DECK.sync.batch_size)),
+        });
+        if (response.ok) {
+            const {last} = await response.json();
+            state.queue = state.queue.filter(event => event[0] > last);
+            save();
+        }
+    } catch (error) {
+        // Offline after all; the events wait for the next attempt
+    } finally {
+        syncing = false;
+        renderSync();
+    }
+    if (state.queue.length >= DECK.sync.batch_size) sync();
+}
+
+function renderSync() {
+    const waiting = state.queue.length;
+    document.getElementById("sync").textContent = !DECK.sync.url ? "Offline-Modus ohne Synchronisierung"
+        : waiting ? `${waiting} Ereignis(se) warten auf die Synchronisierung` + (navigator.onLine ? "" : " (offline)")
+        : "✅ Alles synchronisiert";
+}
+
+window.addEventListener("online", sync);
+document.addEventListener("visibilitychange", () => {
+    // A closing tab gets one last try; the server ignores events it already has
+    if (document.visibilityState === "hidden" && DECK.sync.url && state.queue.length && navigator.sendBeacon)
+        navigator.sendBeacon(DECK.sync.url, syncBody(state.queue.slice(0, DECK.sync.batch_size)));
+});
+setInterval(sync, DECK.sync.interval * 1000);
+
+function el(tag, attrs, ...children) {
+    const node = document.createElement(tag);
+    for (const [key, value] of Object.entries(attrs || {})) {
+        if (key.startsWith("on")) node.addEventListener(key.slice(2), value);
+        else if (value !== false && value != null) node.setAttribute(key, value === true ? "" : value);
+    }
+    // Card text is set as text, never parsed as HTML
+    node.append(...children);
+    return node;
+}
+
+// Karteikarten: the SM-2 rules of scheduler.py, card state as [ease, interval, reps, due, lapses]
+function review(card, rating, t) {
+    const quality = SM2.quality[rating];
+    card[0] = Math.max(SM2.min_ease, card[0] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02));
+    if (quality < 3) {
+        card[1] = 0;
+        card[2] = 0;
+        card[4] += 1;
+        card[3] = t + SM2.relearn_delay;
+        return;
+    }
+    card[2] += 1;
+    if (card[2] === 1) card[1] = 1;
+    else if (card[2] === 2) card[1] = 6;
+    else if (rating === 1) card[1] *= SM2.hard_factor;
+    else card[1] *= card[0];
+    if (rating === 3) card[1] *= SM2.easy_bonus;
+    card[3] = t + card[1] * SM2.day;
+}
+
+function nextCard(t) {
+    let best = null;
+    for (const [id, card] of Object.entries(state.cards)) {
+        if (best === null || card[3] < state.cards[best][3]) best = Number(id);
+    }
+    if (best !== null && state.cards[best][3] <= t) return best;
+    while (state.nextNew < DECK.flashcards.length && state.cards[state.nextNew]) state.nextNew += 1;
+    if (state.nextNew < DECK.flashcards.length) return state.nextNew;
+    return best;
+}
+
+let flipped = false;
+
+function rate(rating) {
+    const t = now();
+    const card = state.cards[state.current] || (state.cards[state.current] = [SM2.start_ease, 0, 0, 0, 0]);
+    review(card, rating, t);
+    log("card_rated", {card: state.current, rating: rating});
+    state.current = null;
+    flipped = false;
+    render();
+}
+
+function showFlashcards() {
+    if (state.current === null || state.current >= DECK.flashcards.length) state.current = nextCard(now());
+    if (state.current === null) return [el("p", {}, "Dieses Deck enthält noch keine Karteikarten.")];
+    const [question, answer] = DECK.flashcards[state.current];
+    const flip = () => { flipped = !flipped; render(); };
+    const face = flipped
+        ? el("div", {}, el("h3", {style: "color: #667eea;"}, question), el("p", {}, answer))
+        : el("div", {}, el("h2", {}, question),
+             el("p", {style: "color: #718096; margin-top: 30px;"}, "Klicke zum Umdrehen"));
+    const card = state.cards[state.current];
+    return [
+        el("h1", {}, "📇 Karteikarten"),
+        el("div", {class: "flashcard", onclick: flip}, face),
+        flipped ? el("div", {class: "row"}, ...DECK.ratings.map(
+            (label, rating) => el("button", {onclick: () => rate(rating)}, label))) : "",
+        el("p", {}, el("b", {}, `Karte ${state.current + 1} von ${DECK.flashcards.length}`),
+           card ? ` · Intervall ${card[1].toFixed(0)} Tag(e) · Leichtigkeit ${card[0].toFixed(2)}` : " · neu"),
+    ];
+}
+
+// Quiz: a session of random questions with shuffled options
+let quiz = null;
+
+function shuffle(items) {
+    for (let i = items.length - 1; i > 0; i--) {
+        const j = Math.floor(Math.random() * (i + 1));
+        [items[i], items[j]] = [items[j], items[i]];
+    }
+    return items;
+}
+
+function startQuiz() {
+    const ids = shuffle(DECK.quiz_questions.map((_, i) => i)).slice(0, DECK.quiz_session_size);
+    quiz = {session: ids, position: 0, score: 0, choice: null, done: false,
+            order: shuffle(DECK.quiz_questions[ids[0]].options.map((_, i) => i))};
+}
+
+function answer(i) {
+    const question = DECK.quiz_questions[quiz.session[quiz.position]];
+    quiz.choice = quiz.order[i];
+    const correct = quiz.choice === question.correct;
+    if (correct) quiz.score += 1;
+    log("quiz_answered", {question: quiz.session[quiz.position], choice: quiz.choice, correct: correct});
+    render();
+}
+
+function nextQuestion() {
+    quiz.position += 1;
+    quiz.choice = null;
+    if (quiz.position < quiz.session.length) {
+        quiz.order = shuffle(DECK.quiz_questions[quiz.session[quiz.position]].options.map((_, i) => i));
+    } else {
+        quiz.done = true;
+        log("quiz_completed", {score: quiz.score, total: quiz.session.length});
+    }
+    render();
+}
+
+function showQuiz() {
+    if (!DECK.quiz_questions.length) return [el("p", {}, "Dieses Deck enthält noch keine Quizfragen.")];
+    if (quiz === null) startQuiz();
+    const header = el("h1", {}, "❓ Interaktives Quiz");
+    if (quiz.done) {
+        return [header, el("h3", {}, `🎉 Dein Ergebnis: ${quiz.score}/${quiz.session.length} Punkten`),
+                el("button", {onclick: () => { startQuiz(); render(); }}, "Quiz wiederholen 🔄")];
+    }
+    const question = DECK.quiz_questions[quiz.session[quiz.position]];
+    const answered = quiz.choice !== null;
+    const options = quiz.order.map((option, i) => {
+        const status = !answered ? "" : option === question.correct ? " correct" : option === quiz.choice ? " incorrect" : "";
+        return el("button", {class: "quiz-option" + status, disabled: answered, onclick: () => answer(i)},
+                  `${String.fromCharCode(65 + i)}  ${question.options[option]}`);
+    });
+    return [
+        header,
+        el("h3", {}, `Frage ${quiz.position + 1} von ${quiz.session.length}`),
+        el("p", {}, el("b", {}, question.question)),
+        ...options,
+        answered ? el("p", {}, (quiz.choice === question.correct ? "✅ Richtig!" : "❌ Leider falsch.")
+                      + ` 💡 ${question.explanation}`) : "",
+        answered ? el("button", {class: "primary", onclick: nextQuestion}, "Nächste Frage ➡️") : "",
+    ];
+}
+
+// Memory: a random sample of the pair pool, terms and definitions shuffled together
+let memory = null;
+
+function dealMemory() {
+    const pool = DECK.memory_pairs.map((_, i) => i);
+    const pairs = shuffle(pool).slice(0, Math.min(state.memoryRoundSize, pool.length));
+    memory = {pairs: pairs, layout: shuffle(pairs.flatMap((_, slot) => [slot * 2, slot * 2 + 1])),
+              open: [], matched: new Set(), moves: 0, hideTimer: null};
+}
+
+function hideMismatch() {
+    clearTimeout(memory.hideTimer);
+    memory.open = [];
+}
+
+function flipMemory(i) {
+    if (memory.open.length === 2) hideMismatch();
+    memory.open.push(i);
+    if (memory.open.length === 2) {
+        const [a, b] = memory.open.map(j => memory.layout[j]);
+        const matched = a >> 1 === b >> 1;
+        memory.moves += 1;
+        log("memory_move", {pairs: [memory.pairs[a >> 1], memory.pairs[b >> 1]], matched: matched});
+        if (matched) {
+            memory.matched.add(a >> 1);
+            memory.open = [];
+            if (memory.matched.size === memory.pairs.length) log("memory_completed", {moves: memory.moves});
+        } else {
+            memory.hideTimer = setTimeout(() => { hideMismatch(); render(); }, DECK.memory_reveal_ms);
+        }
+    }
+    render();
+}
+
+function showMemory() {
+    if (!DECK.memory_pairs.length) return [el("p", {}, "Dieses Deck enthält noch keine Memory-Paare.")];
+    if (memory === null) dealMemory();
+    const sizes = el("select", {onchange: event => {
+        state.memoryRoundSize = Number(event.target.value);
+        save();
+        dealMemory();
+        render();
+    }}, ...DECK.memory_round_sizes.map(size => el("option", {value: size, selected: size === state.memoryRoundSize}, size)));
+    const cards = memory.layout.map((value, i) => {
+        const text = DECK.memory_pairs[memory.pairs[value >> 1]][value & 1];
+        if (memory.matched.has(value >> 1)) return el("div", {class: "memory-card matched"}, text);
+        if (memory.open.includes(i)) return el("div", {class: "memory-card flipped"}, text);
+        return el("div", {class: "memory-card", onclick: () => flipMemory(i)}, "?");
+    });
+    const done = memory.matched.size === memory.pairs.length;
+    return [
+        el("h1", {}, "🎮 Memory"),
+        el("div", {class: "row"}, el("label", {}, "Paare pro Runde ", sizes),
+           el("button", {onclick: () => { dealMemory(); render(); }}, "Neu starten 🔄")),
+        el("p", {}, `Züge: ${memory.moves} · Gefundene Paare: ${memory.matched.size}/${memory.pairs.length}`),
+        done ? el("p", {}, `🎉 Alle Paare in ${memory.moves} Zügen gefunden!`) : "",
+        el("div", {class: "memory-grid"}, ...cards),
+    ];
+}
+
+const MODES = {"📇 Karteikarten": showFlashcards, "❓ Quiz": showQuiz, "🎮 Memory": showMemory};
+let mode = Object.keys(MODES)[0];
+
+function render() {
+    const nav = el("nav", {}, ...Object.keys(MODES).map(label => el("button", {
+        class: label === mode ? "active" : "", onclick: () => { mode = label; render(); },
+    }, label)));
+    document.getElementById("app").replaceChildren(nav, ...MODES[mode]());
+    renderSync();
+}
+
+render();
+sync();
+"""
+
+PAGE = """<!DOCTYPE html>
+<html lang="de">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>{css}</style>
+</head>
+<body class="stApp">
+<main>
+<div id="app"></div>
+<p id="sync" class="sync"></p>
+</main>
+<script id="deck" type="application/json">{data}</script>
+<script>{js}</script>
+</body>
+</html>
+"""
+
+
+def _script_json(value):
+    # Inside <script>, "</" could end the element early; \\u escapes keep the JSON identical
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/").replace(
+        "\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+def deck_data(deck, sync_url=None):
+    """Everything the client needs, as plain JSON: content, SM-2 constants and sync settings."""
+    return {
+        "title": deck.title,
+        "version": deck.version,
+        "flashcards": deck.flashcards(),
+        "quiz_questions": [deck.quiz_question(i) for i in range(deck.quiz_count())],
+        "memory_pairs": deck.memory_pairs(),
+        "ratings": list(RATINGS.values()),
+        "scheduler": {
+            "quality": [QUALITY[rating] for rating in RATINGS],
+            "min_ease": MIN_EASE,
+            "start_ease": START_EASE,
+            "easy_bonus": EASY_BONUS,
+            "hard_factor": HARD_FACTOR,
+            "relearn_delay": RELEARN_DELAY,
+            "day": DAY,
+        },
+        "quiz_session_size": SESSION_SIZE,
+        "memory_round_sizes": MEMORY_ROUND_SIZES,
+        "memory_reveal_ms": MEMORY_REVEAL_MS,
+        "sync": {"url": sync_url, "interval": SYNC_INTERVAL, "batch_size": SYNC_BATCH_SIZE},
+    }
+
+
+def build_bundle(deck, sync_url=None):
+    """The bundle as one HTML string, without references to any other file."""
+    title = deck.title.replace("&", "&amp;").replace("<", "&lt;")
+    return PAGE.format(title=title, css=minify_css(CARD_CSS + BUNDLE_CSS),
+                       data=_script_json(deck_data(deck, sync_url)), js=CLIENT_JS)
+
+
+def _valid(event):
+    # [seq, ts, kind, payload] as written by the client's log()
+    return (isinstance(event, list) and len(event) == 4 and isinstance(event[0], int)
+            and isinstance(event[1], (int, float)) and math.isfinite(event[1])
+            and event[2] in SYNC_KINDS and well_formed(event[2], event[3]))
+
+
+class SyncReceiver:
+    """Takes event batches from bundles into the progress store, each event exactly once.
+
+    Every device numbers its events; the highest number taken so far is
+    logged as an ``offline_sync`` event with the batch, so a batch sent
+    twice (a lost response, the beacon of a closing tab) is only counted
+    once. Card ratings are also replayed on the user's saved scheduler,
+    so the app continues with the due dates the bundle produced. Events are
+    stored under ``progress_key(user, deck_name, default)``, like the app's.
+    """
+
+    def __init__(self, store, deck, deck_name=None, default=None):
+        self.store = store
+        self.deck = deck
+        self.deck_name = deck_name
+        self.default = default
+        self._lock = threading.Lock()
+        self._cursors = {}  # (user, device) -> last seq taken
+
+    def _cursor(self, user_id, device):
+        key = (user_id, device)
+        if key not in self._cursors:
+            self.store.flush()
+            last = 0
+            for _, _, _, payload in self.store.iter_events(user_id, ("offline_sync",)):
+                if payload["device"] == device:
+                    last = max(last, payload["last"])
+            self._cursors[key] = last
+        return self._cursors[key]
+
+    def receive(self, user_id, device, events):
+        """Record the events not seen before; returns the device's last seq now on disk.
+
+        Raises ``sqlite3.Error`` when they could not be written yet; the
+        device keeps its events then, and the batch it sends again is
+        acknowledged once the write went through.
+        """
+        now = time.time()
+        user_id = progress_key(user_id, self.deck_name, self.default)
+        with self._lock:
+            last = self._cursor(user_id, device)
+            fresh = sorted((e for e in events if e[0] > last), key=lambda e: e[0])
+            if fresh:
+                for _, ts, kind, payload in fresh:
+                    # A wrong device clock must not place events in the future
+                    self.store.record(user_id, kind, payload, ts=min(ts, now))
+                last = fresh[-1][0]
+                self.store.record(user_id, "offline_sync", {"device": device, "last": last, "events": len(fresh)})
+                self._cursors[user_id, device] = last
+                self._replay_ratings(user_id, [e for e in fresh if e[2] == "card_rated"])
+            # The device deletes what is acknowledged, so it must be written, not just buffered;
+            # a failed write stays buffered, so a batch sent again is not taken twice either
+            self.store.flush()
+            return last
+
+    def _replay_ratings(self, user_id, ratings):
+        snapshot = self.store.load(user_id)
+        if not ratings or snapshot is None:
+            # Without a snapshot the app has no plan to update; the events are in the log either way
+            return
+        card_count = self.deck.flashcard_count()
+        scheduler = Scheduler.from_dict(snapshot["scheduler"], card_count)
+        studied = set(snapshot["cards_studied"])
+        for _, ts, _, payload in ratings:
+            card, rating = payload.get("card"), payload.get("rating")
+            if isinstance(card, int) and 0 <= card < card_count and rating in RATINGS:
+                scheduler.jump(card, ts, remember=False)
+                scheduler.rate(rating, ts)
+                studied.add(card)
+        snapshot["scheduler"] = scheduler.to_dict()
+        snapshot["cards_studied"] = sorted(studied)
+        self.store.save_snapshot(user_id, snapshot)
+
+
+def make_handler(bundle, receiver):
+    page = bundle.encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body=b"", content_type="application/json"):
+            self.send_response(status)
+            # Bundles opened from disk post from origin "null"
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if urlsplit(self.path).path in ("/", "/index.html"):
+                self._send(HTTPStatus.OK, page, "text/html; charset=utf-8")
+            else:
+                self._send(HTTPStatus.NOT_FOUND)
+
+        def do_POST(self):
+            if urlsplit(self.path).path != "/sync":
+                return self._send(HTTPStatus.NOT_FOUND)
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY:
+                return self._send(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            try:
+                body = json.loads(self.rfile.read(length))
+                user_id, device, events = body["user"], body["device"], body["events"]
+            except (ValueError, TypeError, KeyError):
+                return self._send(HTTPStatus.BAD_REQUEST)
+            if not (isinstance(user_id, str) and user_id and isinstance(device, str) and device
+                    and isinstance(events, list) and all(map(_valid, events))):
+                return self._send(HTTPStatus.BAD_REQUEST)
+            try:
+                last = receiver.receive(user_id, device, events)
+            except sqlite3.Error as exc:
+                # E.g. the database is locked by the app; the device tries again later
+                self.log_error("Sync failed: %s", exc)
+                return self._send(HTTPStatus.SERVICE_UNAVAILABLE)
+            self._send(HTTPStatus.OK, json.dumps({"last": last}).encode())
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="write the bundle to a file")
+    serve = commands.add_parser("serve", help="serve the bundle and take its sync batches")
+    for command in (build, serve):
+        command.add_argument("--deck", type=Path,
+                             default=Path(os.environ.get("LERNEN_DECK", "decks/somatoforme.json")))
+    build.add_argument("--out", type=Path, help="output file (default: <deck>.html)")
+    build.add_argument("--sync-url", help="where the bundle posts its events (default: no sync)")
+    serve.add_argument("--db", type=Path,
+                       default=Path(os.environ.get("LERNEN_PROGRESS_DB", "data/progress.sqlite")))
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args(argv)
+
+    deck = DeckStore(ensure_deck(args.deck))
+    try:
+        if args.command == "build":
+            out = args.out or args.deck.with_suffix(".html")
+            out.write_text(build_bundle(deck, args.sync_url), encoding="utf-8")
+            print(f"{out}: {deck.flashcard_count()} Karten, {deck.quiz_count()} Quizfragen, "
+                  f"{deck.memory_pair_count()} Memory-Paare")
+            return 0
+
+        store = ProgressStore(args.db)
+        # Progress of decks other than the app's default is kept under "<user>@<deck>"
+        default_deck = Path(os.environ.get("LERNEN_DECK", "decks/somatoforme.json")).stem
+        # Served from here, the bundle syncs back to the same origin
+        handler = make_handler(build_bundle(deck, "/sync"), SyncReceiver(store, deck, args.deck.stem, default_deck))
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        print(f"Offline-Bundle unter http://{args.host}:{args.port}/?u=<nutzer>")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            store.close()
+        return 0
+    finally:
+        deck.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Background warm-up of what the next click will likely show, while the learner reads the current item."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+WORKERS = 2
+MAX_PENDING = 64  # requests beyond this are dropped, not queued: a late warm-up is worth nothing
+
+
+class Prefetcher:
+    """Runs warm-up jobs on a small thread pool shared by all sessions.
+
+    A job only fills process-wide caches (deck rows, rendered card HTML,
+    generated quiz questions), so the rerun after the next click finds
+    everything ready; it never touches a session's state. Jobs are keyed,
+    and a key that is already queued or running is not submitted again.
+    """
+
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING):
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def submit(self, key, fn, *args):
+        """Run ``fn(*args)`` in the background unless ``key`` is pending; returns whether it was queued."""
+        with self._lock:
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.add(key)
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self._done(key, f))
+        return True
+
+    def _done(self, key, future):
+        with self._lock:
+            self._pending.discard(key)
+        error = future.exception()
+        if error is not None:
+            # E.g. the deck shrank in the meantime; the rerun will report it if it still matters
+            logger.debug("Prefetch %r failed: %r", key, error)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,283 @@
+"""Persistent per-user progress: append-only event log plus latest snapshot, written behind."""
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_user ON events (user_id, id);
+CREATE TABLE IF NOT EXISTS snapshots (
+    user_id TEXT PRIMARY KEY,
+    updated REAL NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    updated REAL NOT NULL,
+    state BLOB NOT NULL
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 2.0  # seconds between background writes
+BATCH_SIZE = 500  # flush early once this many events are buffered
+PAGE_SIZE = 1000  # events per query when iterating a whole history
+SESSION_TTL = 7 * 24 * 60 * 60  # view state of a tab not seen for a week is dropped
+
+# Payload fields the readers of the log (analytics, export, sync replay) rely on, per event kind
+EVENT_FIELDS = {
+    "card_rated": {"card": int, "rating": int},
+    "quiz_answered": {"question": int, "correct": bool},
+    "quiz_completed": {"score": int, "total": int},
+    "memory_move": {"pairs": list, "matched": bool},
+    "memory_completed": {"moves": int},
+}
+QUIZ_CHOICE_FIELDS = {"deck": "choice", "karten": "choice_card"}  # by the answer's question source
+
+
+def _has_type(value, kind):
+    if kind is int:
+        # Indices and counts; bool is an int to Python but never one of these
+        return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+    return isinstance(value, kind)
+
+
+def well_formed(kind, payload):
+    """Whether an event's payload has the fields its kind needs; kinds without a schema always pass."""
+    fields = EVENT_FIELDS.get(kind)
+    if fields is None:
+        return True
+    if not isinstance(payload, dict):
+        return False
+    if kind == "quiz_answered":
+        choice = QUIZ_CHOICE_FIELDS.get(payload.get("source", "deck"))
+        if choice is None:
+            return False
+        fields = {**fields, choice: int}
+    return all(_has_type(payload.get(name), expected) for name, expected in fields.items())
+
+
+class ProgressStore:
+    """Buffers events and snapshots in memory and writes them from one background thread.
+
+    ``record``, ``save_snapshot`` and ``save_session`` only fill in-memory buffers, so a
+    Streamlit interaction never waits on disk. The writer thread commits
+    everything buffered in a single transaction every ``flush_interval``
+    seconds, or sooner when ``batch_size`` events are waiting.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._write_conn = self._connect()
+        self._write_conn.executescript(SCHEMA)
+        with self._write_conn:
+            self._write_conn.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - SESSION_TTL,))
+        self._committed_id = self._last_event_id()
+        self._write_lock = threading.Lock()
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+
+        self._cond = threading.Condition()
+        self._events = []
+        self._inflight_events = []
+        self._snapshots = {}
+        self._inflight = {}
+        self._sessions = {}
+        self._inflight_sessions = {}
+        self._closed = False
+
+        self._writer = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _last_event_id(self):
+        return self._write_conn.execute("SELECT coalesce(max(id), 0) FROM events").fetchone()[0]
+
+    def record(self, user_id, kind, payload=None, ts=None):
+        event = (
+            user_id,
+            time.time() if ts is None else ts,
+            kind,
+            json.dumps(payload or {}, ensure_ascii=False),
+        )
+        with self._cond:
+            self._events.append(event)
+            if len(self._events) >= self.batch_size:
+                self._cond.notify()
+
+    def save_snapshot(self, user_id, state):
+        # Serialize now, so the writer never sees a half-updated session dict
+        text = json.dumps(state, ensure_ascii=False)
+        with self._cond:
+            self._snapshots[user_id] = (time.time(), text)
+
+    def load(self, user_id):
+        # Unflushed snapshots win over the database, so a quick reload never goes back in time
+        with self._cond:
+            pending = self._snapshots.get(user_id) or self._inflight.get(user_id)
+        if pending is not None:
+            return json.loads(pending[1])
+        with self._read_lock:
+            row = self._read_conn.execute("SELECT state FROM snapshots WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_session(self, token, user_id, state):
+        # state: the bytes of a session_snapshot.SessionSnapshot; only the latest per token is written
+        with self._cond:
+            self._sessions[token] = (user_id, time.time(), state)
+
+    def load_session(self, token, user_id):
+        """The latest view state saved under ``token``, if it belongs to ``user_id``."""
+        with self._cond:
+            pending = self._sessions.get(token) or self._inflight_sessions.get(token)
+        if pending is not None:
+            owner, state = pending[0], pending[2]
+        else:
+            with self._read_lock:
+                row = self._read_conn.execute(
+                    "SELECT user_id, state FROM sessions WHERE token = ?", (token,)
+                ).fetchone()
+            if row is None:
+                return None
+            owner, state = row
+        return bytes(state) if owner == user_id else None
+
+    def events(self, user_id, after_id=0, kinds=None, limit=None, until_id=None):
+        sql = "SELECT id, ts, kind, payload FROM events WHERE user_id = ? AND id > ?"
+        params = [user_id, after_id]
+        if until_id is not None:
+            sql += " AND id <= ?"
+            params.append(until_id)
+        if kinds:
+            sql += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._read_lock:
+            rows = self._read_conn.execute(sql, params).fetchall()
+        return [(event_id, ts, kind, json.loads(payload)) for event_id, ts, kind, payload in rows]
+
+    def iter_events(self, user_id, kinds=None, page_size=PAGE_SIZE, until_id=None):
+        # Pages through the log by id, so exporting a long history never holds all of it
+        after_id = 0
+        while True:
+            page = self.events(user_id, after_id, kinds, limit=page_size, until_id=until_id)
+            yield from page
+            if len(page) < page_size:
+                return
+            after_id = page[-1][0]
+
+    def user_ids(self):
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                "SELECT user_id FROM snapshots UNION SELECT DISTINCT user_id FROM events ORDER BY 1"
+            ).fetchall()
+        return [user_id for (user_id,) in rows]
+
+    def unflushed(self, user_id, kinds=None):
+        """The events of ``user_id`` not written yet, and the id of the last event that is.
+
+        Reading ``events(..., until_id=...)`` and adding these sees every event
+        exactly once, without waiting for (or forcing) a write. The rows have
+        ``None`` for an id.
+        """
+        with self._cond:
+            pending = self._inflight_events + self._events
+            until_id = self._committed_id
+        return until_id, [
+            (None, ts, kind, json.loads(payload))
+            for event_user, ts, kind, payload in pending
+            if event_user == user_id and (not kinds or kind in kinds)
+        ]
+
+    def flush(self):
+        with self._write_lock:
+            with self._cond:
+                events, self._events = self._events, []
+                snapshots, self._snapshots = self._snapshots, {}
+                sessions, self._sessions = self._sessions, {}
+                self._inflight_events = events
+                self._inflight = snapshots
+                self._inflight_sessions = sessions
+            try:
+                if events or snapshots or sessions:
+                    with self._write_conn:
+                        self._write_conn.executemany(
+                            "INSERT INTO events (user_id, ts, kind, payload) VALUES (?, ?, ?, ?)", events
+                        )
+                        self._write_conn.executemany(
+                            "INSERT INTO snapshots (user_id, updated, state) VALUES (?, ?, ?) "
+                            "ON CONFLICT (user_id) DO UPDATE SET updated = excluded.updated, state = excluded.state",
+                            [(user_id, updated, text) for user_id, (updated, text) in snapshots.items()],
+                        )
+                        self._write_conn.executemany(
+                            "INSERT INTO sessions (token, user_id, updated, state) VALUES (?, ?, ?, ?) "
+                            "ON CONFLICT (token) DO UPDATE SET user_id = excluded.user_id, "
+                            "updated = excluded.updated, state = excluded.state",
+                            [(token, *row) for token, row in sessions.items()],
+                        )
+                # Also picks up events other processes wrote since
+                committed_id = self._last_event_id()
+                with self._cond:
+                    self._committed_id = committed_id
+                    self._inflight_events = []
+            except sqlite3.Error:
+                # Back into the buffers for the next flush (e.g. another process held the lock):
+                # the batch goes before newer events, a newer snapshot or session wins over its own
+                with self._cond:
+                    self._inflight_events = []
+                    self._events[:0] = events
+                    for user_id, snapshot in snapshots.items():
+                        self._snapshots.setdefault(user_id, snapshot)
+                    for token, session in sessions.items():
+                        self._sessions.setdefault(token, session)
+                raise
+            finally:
+                with self._cond:
+                    self._inflight = {}
+                    self._inflight_sessions = {}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._events) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closing = self._closed
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception("Writing progress to %s failed", self.path)
+            if closing:
+                return
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._writer.join()
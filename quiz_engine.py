@@ -0,0 +1,160 @@
+"""Adaptive quiz sessions: questions sampled by past error rate, options shuffled."""
+import random
+from functools import lru_cache
+from itertools import permutations
+
+SESSION_SIZE = 10
+MAX_SHUFFLED_OPTIONS = 6  # 720 permutations; longer option lists keep their order
+
+
+class FenwickTree:
+    """Prefix sums over non-negative weights with O(log n) update and sampling."""
+
+    def __init__(self, weights):
+        self.size = len(weights)
+        self._tree = [0.0] + list(weights)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self._tree[parent] += self._tree[i]
+        self._top = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def add(self, index, delta):
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def total(self):
+        total, i = 0.0, self.size
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, target):
+        # Smallest index whose prefix sum exceeds target
+        pos, step = 0, self._top
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return min(pos, self.size - 1)
+
+
+@lru_cache(maxsize=None)
+def option_permutations(count):
+    # Each permutation with its inverse, so the correct answer is remapped by lookup
+    if count > MAX_SHUFFLED_OPTIONS:
+        identity = tuple(range(count))
+        return ((identity, identity),)
+    result = []
+    for order in permutations(range(count)):
+        inverse = [0] * count
+        for shown, original in enumerate(order):
+            inverse[original] = shown
+        result.append((order, tuple(inverse)))
+    return tuple(result)
+
+
+def shuffled(question, permutation):
+    """The question with its options in ``permutation`` order and ``correct`` remapped."""
+    perms = option_permutations(len(question["options"]))
+    order, inverse = perms[permutation % len(perms)]
+    return {
+        **question,
+        "options": tuple(question["options"][i] for i in order),
+        "correct": inverse[question["correct"]],
+        "order": order,
+    }
+
+
+class QuizEngine:
+    """Per-question error statistics and the current sampled session.
+
+    A question's weight is its smoothed error rate ``(wrong + 1) / (seen + 2)``,
+    so unseen questions start at 0.5 and questions answered wrongly come back
+    more often. The weights live in a Fenwick tree: recording an answer and
+    drawing a question are both O(log n), and a session of ``session_size``
+    questions is drawn without replacement in O(size · log n).
+    """
+
+    def __init__(self, question_count, session_size=SESSION_SIZE, seed=None, stats=None):
+        self.question_count = question_count
+        self.session_size = session_size
+        self.stats = stats or {}  # question_id -> [seen, wrong], answered questions only
+        self.session = []  # (question_id, permutation index)
+        self.position = 0
+        self._rng = random.Random(seed)
+        self._build_tree()
+
+    def _build_tree(self):
+        self._tree = FenwickTree([self.weight(q) for q in range(self.question_count)])
+
+    def resize(self, question_count):
+        # The bank grew (e.g. after an import); new questions start unseen
+        if question_count > self.question_count:
+            self.question_count = question_count
+            self._build_tree()
+
+    def weight(self, question_id):
+        seen, wrong = self.stats.get(question_id, (0, 0))
+        return (wrong + 1) / (seen + 2)
+
+    def start_session(self, option_counts):
+        """Draw a new session; ``option_counts(question_id)`` gives each question's option count."""
+        size = min(self.session_size, self.question_count)
+        drawn = []
+        for _ in range(size):
+            question_id = self._tree.find(self._rng.random() * self._tree.total())
+            while question_id in drawn:
+                # Rounding can leave a drawn question a sliver of weight
+                question_id = self._tree.find(self._rng.random() * self._tree.total())
+            drawn.append(question_id)
+            self._tree.add(question_id, -self.weight(question_id))
+        for question_id in drawn:
+            self._tree.add(question_id, self.weight(question_id))
+        self.session = [
+            (q, self._rng.randrange(len(option_permutations(option_counts(q))))) for q in drawn
+        ]
+        self.position = 0
+
+    def current(self):
+        return self.session[self.position] if self.position < len(self.session) else (None, 0)
+
+    @property
+    def finished(self):
+        return self.position >= len(self.session)
+
+    def record(self, question_id, correct):
+        before = self.weight(question_id)
+        stats = self.stats.setdefault(question_id, [0, 0])
+        stats[0] += 1
+        if not correct:
+            stats[1] += 1
+        self._tree.add(question_id, self.weight(question_id) - before)
+
+    def advance(self):
+        self.position += 1
+
+    def error_rate(self, question_id):
+        seen, wrong = self.stats.get(question_id, (0, 0))
+        return wrong / seen if seen else None
+
+    def to_dict(self):
+        # Only answered questions are stored, so the snapshot scales with use, not with the bank
+        return {
+            "stats": {str(q): stats for q, stats in self.stats.items()},
+            "session": [list(item) for item in self.session],
+            "position": self.position,
+        }
+
+    @classmethod
+    def from_dict(cls, data, question_count, session_size=SESSION_SIZE):
+        stats = {int(q): list(s) for q, s in data["stats"].items() if int(q) < question_count}
+        engine = cls(question_count, session_size, stats=stats)
+        engine.session = [(q, p) for q, p in data["session"] if q < question_count]
+        engine.position = min(data["position"], len(engine.session))
+        return engine
@@ -0,0 +1,236 @@
+"""SM-2 spaced-repetition scheduler with a heap-based due queue."""
+import heapq
+import math
+import time
+from dataclasses import dataclass
+
+AGAIN, HARD, GOOD, EASY = range(4)
+RATINGS = {
+    AGAIN: "🔁 Nochmal",
+    HARD: "😓 Schwer",
+    GOOD: "🙂 Gut",
+    EASY: "😎 Leicht",
+}
+
+# SM-2 response quality (0-5) for each rating
+QUALITY = {AGAIN: 1, HARD: 3, GOOD: 4, EASY: 5}
+
+DAY = 24 * 60 * 60
+MIN_EASE = 1.3
+START_EASE = 2.5
+EASY_BONUS = 1.3
+HARD_FACTOR = 1.2
+RELEARN_DELAY = 60  # "Nochmal" shows the card again after a minute
+SKIP_DELAY = 10 * 60  # "Weiter" without rating postpones the card
+
+
+@dataclass(slots=True)
+class CardState:
+    ease: float = START_EASE
+    interval: float = 0.0  # days
+    reps: int = 0
+    due: float = 0.0
+    lapses: int = 0
+
+
+def review(state, rating, now):
+    # Classic SM-2 update, with an extra factor for hard/easy answers
+    quality = QUALITY[rating]
+    state.ease = max(MIN_EASE, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    if quality < 3:
+        state.reps = 0
+        state.interval = 0.0
+        state.lapses += 1
+        state.due = now + RELEARN_DELAY
+        return state
+
+    state.reps += 1
+    if state.reps == 1:
+        state.interval = 1.0
+    elif state.reps == 2:
+        state.interval = 6.0
+    elif rating == HARD:
+        state.interval = state.interval * HARD_FACTOR
+    else:
+        state.interval = state.interval * state.ease
+    if rating == EASY:
+        state.interval *= EASY_BONUS
+    state.due = now + state.interval * DAY
+    return state
+
+
+class Scheduler:
+    """Due queue over a deck of ``card_count`` cards.
+
+    Reviewed cards sit in a min-heap keyed by due time. Unseen cards are
+    introduced in deck order through ``next_new``, so the queue only grows
+    with the cards a learner actually touched. Entries that were re-queued
+    or taken out of order are invalidated lazily via ``_queued``.
+    """
+
+    def __init__(self, card_count, now=None):
+        self.card_count = card_count
+        self.cards = {}
+        self.next_new = 0
+        self.current = None
+        self.history = []
+        self._heap = []
+        self._queued = {}
+        self.advance(now)
+
+    def _now(self, now):
+        return time.time() if now is None else now
+
+    def _push(self, card_id, due):
+        heapq.heappush(self._heap, (due, card_id))
+        self._queued[card_id] = due
+
+    def _is_live(self, due, card_id):
+        return self._queued.get(card_id) == due
+
+    def _pop_due(self, now):
+        heap = self._heap
+        while heap:
+            due, card_id = heap[0]
+            if not self._is_live(due, card_id):
+                heapq.heappop(heap)
+            elif due <= now:
+                heapq.heappop(heap)
+                del self._queued[card_id]
+                return card_id
+            else:
+                break
+        return None
+
+    def _is_new(self, card_id):
+        return card_id not in self.cards and card_id not in self._queued and card_id != self.current
+
+    def _next_new(self):
+        while self.next_new < self.card_count and not self._is_new(self.next_new):
+            self.next_new += 1
+        if self.next_new < self.card_count:
+            return self.next_new
+        return None
+
+    def _take_next(self, now):
+        card_id = self._pop_due(now)
+        if card_id is None:
+            card_id = self._next_new()
+        if card_id is None:
+            # Nothing due and nothing new: review ahead instead of running dry
+            card_id = self._pop_due(math.inf)
+        return card_id
+
+    def _requeue_current(self, now, delay=0):
+        if self.current is None:
+            return
+        state = self.cards.get(self.current)
+        due = now if state is None else state.due
+        self._push(self.current, max(due, now + delay))
+
+    def advance(self, now=None):
+        self.current = self._take_next(self._now(now))
+        return self.current
+
+    def rate(self, rating, now=None):
+        now = self._now(now)
+        if self.current is None:
+            return None
+        state = self.cards.setdefault(self.current, CardState())
+        review(state, rating, now)
+        self._push(self.current, state.due)
+        self.history.append(self.current)
+        self.current = None
+        return self.advance(now)
+
+    def skip(self, now=None):
+        now = self._now(now)
+        if self.current is None:
+            return self.advance(now)
+        self._requeue_current(now, SKIP_DELAY)
+        self.history.append(self.current)
+        self.current = None
+        return self.advance(now)
+
+    def back(self, now=None):
+        now = self._now(now)
+        while self.history:
+            card_id = self.history.pop()
+            if card_id != self.current and card_id < self.card_count:
+                self.jump(card_id, now, remember=False)
+                break
+        return self.current
+
+    def jump(self, card_id, now=None, remember=True):
+        now = self._now(now)
+        if card_id == self.current:
+            return self.current
+        self._requeue_current(now)
+        if remember and self.current is not None:
+            self.history.append(self.current)
+        self._queued.pop(card_id, None)
+        self.current = card_id
+        return self.current
+
+    def upcoming(self, k, now=None):
+        # Walk the heap best-first with a small frontier heap: O(k log k) instead of sorting the queue
+        now = self._now(now)
+        due, later = [], []
+        frontier = [(self._heap[0], 0)] if self._heap else []
+        while frontier and len(due) + len(later) < k:
+            (entry_due, card_id), pos = heapq.heappop(frontier)
+            if self._is_live(entry_due, card_id):
+                (due if entry_due <= now else later).append(card_id)
+            for child in (2 * pos + 1, 2 * pos + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, (self._heap[child], child))
+
+        fresh = []
+        candidate = self.next_new
+        while len(due) + len(fresh) < k and candidate < self.card_count:
+            if self._is_new(candidate):
+                fresh.append(candidate)
+            candidate += 1
+        return (due + fresh + later)[:k]
+
+    def state(self, card_id):
+        return self.cards.get(card_id)
+
+    def to_dict(self, history_limit=50):
+        return {
+            "card_count": self.card_count,
+            "next_new": self.next_new,
+            "current": self.current,
+            "history": self.history[-history_limit:],
+            "cards": {
+                str(card_id): [s.ease, s.interval, s.reps, s.due, s.lapses]
+                for card_id, s in self.cards.items()
+            },
+            # Includes unseen cards that were skipped or left via a jump: next_new is already past them
+            "queued": {str(card_id): due for card_id, due in self._queued.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data, card_count=None):
+        scheduler = cls.__new__(cls)
+        scheduler.card_count = data["card_count"] if card_count is None else card_count
+        scheduler.next_new = data["next_new"]
+        # Cards past the end of a deck that shrank since are dropped everywhere, or they would be served
+        count = scheduler.card_count
+        current = data["current"]
+        scheduler.current = current if current is not None and current < count else None
+        scheduler.history = [card_id for card_id in data["history"] if card_id < count]
+        scheduler.cards = {
+            int(card_id): CardState(*values) for card_id, values in data["cards"].items() if int(card_id) < count
+        }
+        if "queued" in data:
+            queued = {int(card_id): due for card_id, due in data["queued"].items() if int(card_id) < count}
+        else:
+            # Snapshots from before the queue was saved: only the rated cards
+            queued = {card_id: state.due for card_id, state in scheduler.cards.items()}
+        queued.pop(scheduler.current, None)
+        scheduler._queued = queued
+        scheduler._heap = [(due, card_id) for card_id, due in scheduler._queued.items()]
+        heapq.heapify(scheduler._heap)
+        return scheduler
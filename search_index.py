@@ -0,0 +1,206 @@
+"""Full-text search over a deck: German-aware normalization and a compact inverted index."""
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+FLASHCARD = "flashcard"
+QUIZ = "quiz"
+MEMORY = "memory"
+KINDS = (FLASHCARD, QUIZ, MEMORY)
+
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.5
+MIN_PREFIX = 2  # shorter prefixes would expand to most of the vocabulary
+MIN_FUZZY = 4  # one edit on a shorter word is mostly noise
+MAX_EXPANSIONS = 64
+
+_WORD = re.compile(r"\w+")
+_FOLD = (("ä", "ae"), ("ö", "oe"), ("ü", "ue"), ("ß", "ss"))
+# Inflection first, then derivation ("Störungen" -> "störung" -> "stör"); the lazy
+# stem takes the longest suffix and keeps at least three letters
+_SUFFIXES = (
+    re.compile(r"(\w{3,}?)(?:en|es|em|e|n|s)"),
+    re.compile(r"(\w{3,}?)(?:heit|keit|isch|lich|ung)"),
+)
+
+Hit = namedtuple("Hit", "kind item_id score")
+
+
+def stem(word):
+    for suffix in _SUFFIXES:
+        match = suffix.fullmatch(word)
+        if match is not None:
+            word = match.group(1)
+    return word
+
+
+def fold(text):
+    text = text.lower()
+    for umlaut, replacement in _FOLD:
+        text = text.replace(umlaut, replacement)
+    return _WORD.findall(text)
+
+
+def normalize(text):
+    # Case and umlaut folding first, so "Störung", "STOERUNG" and "Störungen" meet in "stoer"
+    return [stem(word) for word in fold(text)]
+
+
+def _within_one_edit(a, b):
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+class SearchIndex:
+    """Inverted index over flashcards, quiz questions and memory pairs.
+
+    The vocabulary is one sorted list, so a term's postings are found by
+    bisection and a prefix is a contiguous slice of it. Postings for all
+    terms live in a single ``array``, delimited by ``offsets``. Fuzzy
+    matching (one edit) relies on the fact that such a typo leaves either
+    the first or the second half of the word intact: candidates are the
+    terms sharing that prefix, or that suffix in a second, reversed
+    vocabulary.
+    """
+
+    def __init__(self, documents):
+        self._kinds = array("B")
+        self._item_ids = array("I")
+        postings = {}
+        stems = {}
+        for kind, item_id, text in documents:
+            doc_id = len(self._item_ids)
+            self._kinds.append(KINDS.index(kind))
+            self._item_ids.append(item_id)
+            terms = set()
+            for word in set(fold(text)):
+                term = stems.get(word)
+                if term is None:
+                    term = stems[word] = stem(word)
+                terms.add(term)
+            for term in terms:
+                docs = postings.get(term)
+                if docs is None:
+                    postings[term] = array("I", (doc_id,))
+                else:
+                    docs.append(doc_id)
+
+        self._terms = sorted(postings)
+        self._offsets = array("I", [0])
+        self._postings = array("I")
+        for term in self._terms:
+            self._postings.extend(postings[term])
+            self._offsets.append(len(self._postings))
+        reversed_terms = [term[::-1] for term in self._terms]
+        self._reversed_ids = array("I", sorted(range(len(reversed_terms)), key=reversed_terms.__getitem__))
+        self._reversed = [reversed_terms[term_id] for term_id in self._reversed_ids]
+
+    @classmethod
+    def from_deck(cls, deck):
+        return cls(_deck_documents(deck))
+
+    def __len__(self):
+        return len(self._item_ids)
+
+    def _term_id(self, term):
+        i = bisect_left(self._terms, term)
+        return i if i < len(self._terms) and self._terms[i] == term else None
+
+    def _prefix_ids(self, prefix):
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + "\uffff", start)
+        return range(start, min(end, start + MAX_EXPANSIONS))
+
+    def _fuzzy_ids(self, term):
+        half = (len(term) + 1) // 2
+        prefix, suffix = term[:half], term[half:][::-1]
+        candidates = set()
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + "\uffff", start)
+        candidates.update(range(start, end))
+        start = bisect_left(self._reversed, suffix)
+        end = bisect_left(self._reversed, suffix + "\uffff", start)
+        candidates.update(self._reversed_ids[start:end])
+        return [t for t in candidates if _within_one_edit(term, self._terms[t])]
+
+    def _docs(self, term_id):
+        return self._postings[self._offsets[term_id]:self._offsets[term_id + 1]]
+
+    def _idf(self, term_id):
+        return math.log(1 + len(self._item_ids) / (self._offsets[term_id + 1] - self._offsets[term_id]))
+
+    def _expand(self, word, prefix):
+        # (term_id, weight) for every vocabulary term the query word may stand for
+        term = stem(word)
+        expansions = {}
+        exact = self._term_id(term)
+        if exact is not None:
+            expansions[exact] = EXACT_WEIGHT
+        if prefix and len(word) >= MIN_PREFIX:
+            for term_id in self._prefix_ids(word):
+                expansions.setdefault(term_id, PREFIX_WEIGHT)
+            # A half-typed suffix ("Störu") is longer than the stem it belongs to
+            for end in range(len(word) - 1, max(2, len(word) - 6), -1):
+                term_id = self._term_id(word[:end])
+                if term_id is not None:
+                    expansions.setdefault(term_id, PREFIX_WEIGHT)
+        if not expansions and len(term) >= MIN_FUZZY:
+            for term_id in self._fuzzy_ids(term):
+                expansions[term_id] = FUZZY_WEIGHT
+        return expansions
+
+    def search(self, query, limit=10, kinds=None):
+        """Best ``limit`` hits containing every query word.
+
+        The last word also matches as a prefix, so results appear while the
+        user is still typing; words without any match fall back to a
+        one-edit fuzzy lookup.
+        """
+        words = fold(query)
+        if not words:
+            return []
+        matches = []
+        for position, word in enumerate(words):
+            scores = {}
+            for term_id, weight in self._expand(word, prefix=position == len(words) - 1).items():
+                score = weight * self._idf(term_id)
+                for doc_id in self._docs(term_id):
+                    if scores.get(doc_id, 0.0) < score:
+                        scores[doc_id] = score
+            if not scores:
+                return []
+            matches.append(scores)
+
+        # Intersect starting from the rarest word
+        matches.sort(key=len)
+        total = dict(matches[0])
+        for scores in matches[1:]:
+            total = {doc_id: score + scores[doc_id] for doc_id, score in total.items() if doc_id in scores}
+        if kinds is not None:
+            wanted = {KINDS.index(kind) for kind in kinds}
+            total = {doc_id: score for doc_id, score in total.items() if self._kinds[doc_id] in wanted}
+        best = heapq.nsmallest(limit, total.items(), key=lambda item: (-item[1], item[0]))
+        return [Hit(KINDS[self._kinds[doc_id]], self._item_ids[doc_id], score) for doc_id, score in best]
+
+
+def _deck_documents(deck):
+    for card_id, (question, answer) in enumerate(deck.flashcards()):
+        yield FLASHCARD, card_id, f"{question} {answer}"
+    for question_id, (question, options, explanation) in enumerate(deck.quiz_texts()):
+        yield QUIZ, question_id, " ".join((question, *options, explanation))
+    for pair_id, (term, definition) in enumerate(deck.memory_pairs()):
+        yield MEMORY, pair_id, f"{term} {definition}"
@@ -0,0 +1,19 @@
+"""Per-session state size report."""
+import pickle
+import sys
+
+
+def state_sizes(state):
+    # Pickled size per key, largest first; falls back to getsizeof for unpicklable values
+    sizes = {}
+    for key in list(state.keys()):
+        value = state[key]
+        try:
+            sizes[key] = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            sizes[key] = sys.getsizeof(value)
+    return dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+
+
+def total_size(state):
+    return sum(state_sizes(state).values())
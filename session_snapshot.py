@@ -0,0 +1,117 @@
+"""Compact binary snapshot of a session's view state, so a server restart does not reset the screen.
+
+The learning progress itself is in the JSON snapshot of ``progress_store``;
+this covers what only the open browser tab had: the selected mode, whether
+the flashcard is turned over and the Memory board (sampled pairs, shuffled
+layout, matched and open cards, page). Layout of format version 2, all
+integers as unsigned LEB128 varints unless noted::
+
+    B     format version
+    6s    digest of the deck version the board was dealt from
+    B     flags (bit 0: flashcard turned over)
+    B     mode index
+    card  flashcard the flag belongs to, plus one (0: none)
+    page
+    n     pairs in the Memory round, followed by n pool pair ids
+    2n    layout values (slot << 1 | side)
+    ...   matched layout positions as a bitset of ceil(2n / 8) bytes, little endian
+    k     open layout positions, followed by k positions
+
+Version 1 had no card field; its flag is dropped on reading. A 32-pair
+board takes under 200 bytes, an empty one 13.
+"""
+import hashlib
+import struct
+from dataclasses import dataclass
+
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+HEADER = struct.Struct("<B6sBB")
+FLIPPED = 1
+
+
+def deck_digest(version):
+    return hashlib.blake2b(version.encode(), digest_size=6).digest()
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]  # IndexError on truncated data
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("varint too long")
+
+
+@dataclass(slots=True)
+class SessionSnapshot:
+    deck_version: bytes  # deck_digest() of the deck's version
+    mode: int = 0
+    card_flipped: bool = False
+    card: int | None = None  # flashcard shown when card_flipped was saved
+    memory_round: tuple = ()  # pool pair ids
+    memory_layout: tuple = ()
+    memory_matched: int = 0  # bitmask over layout positions
+    memory_open: tuple = ()
+    memory_page: int = 0
+
+    def to_bytes(self):
+        out = bytearray(HEADER.pack(FORMAT_VERSION, self.deck_version, FLIPPED if self.card_flipped else 0,
+                                    self.mode))
+        write_varint(out, 0 if self.card is None else self.card + 1)
+        write_varint(out, self.memory_page)
+        write_varint(out, len(self.memory_round))
+        for value in (*self.memory_round, *self.memory_layout):
+            write_varint(out, value)
+        out += self.memory_matched.to_bytes((len(self.memory_layout) + 7) // 8, "little")
+        write_varint(out, len(self.memory_open))
+        for position in self.memory_open:
+            write_varint(out, position)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """The decoded snapshot; ValueError for another format version or damaged data."""
+        try:
+            version, deck_version, flags, mode = HEADER.unpack_from(data)
+            if version not in READABLE_VERSIONS:
+                raise ValueError(f"format version {version}")
+            pos = HEADER.size
+            card = 0
+            if version >= 2:
+                card, pos = read_varint(data, pos)
+            page, pos = read_varint(data, pos)
+            n, pos = read_varint(data, pos)
+            values = []
+            for _ in range(3 * n):
+                value, pos = read_varint(data, pos)
+                values.append(value)
+            cards = 2 * n
+            size = (cards + 7) // 8
+            if pos + size > len(data):
+                raise ValueError("truncated bitset")
+            matched = int.from_bytes(data[pos:pos + size], "little")
+            pos += size
+            k, pos = read_varint(data, pos)
+            open_cards = []
+            for _ in range(k):
+                position, pos = read_varint(data, pos)
+                open_cards.append(position)
+        except (struct.error, IndexError) as error:
+            raise ValueError("truncated session snapshot") from error
+        layout = tuple(values[n:])
+        if sorted(layout) != list(range(cards)) or any(p >= cards for p in open_cards) or matched >> cards:
+            raise ValueError("inconsistent Memory board")
+        return cls(deck_version, mode, bool(flags & FLIPPED) and card > 0, card - 1 if card else None,
+                   tuple(values[:n]), layout, matched, tuple(open_cards), page)
@@ -0,0 +1,60 @@
+"""Cold-start timing and lazy loading of heavy dependencies."""
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+import_times = {}
+first_run = None
+
+
+def process_age():
+    # Seconds since the server process started (Linux only, None elsewhere)
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+def lazy_import(name):
+    # import_module also waits for an import still running in the preload thread
+    loaded = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not loaded:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            import_times.setdefault(name, elapsed)
+        logger.info("Lazy import of %s took %.0f ms", name, elapsed * 1000)
+    return module
+
+
+def record_run(duration):
+    global first_run
+    with _lock:
+        if first_run is not None:
+            return
+        first_run = {"script_seconds": duration, "process_age_seconds": process_age()}
+    logger.info(
+        "First script run took %.0f ms, process started %s s ago",
+        duration * 1000,
+        "?" if first_run["process_age_seconds"] is None else f"{first_run['process_age_seconds']:.1f}",
+    )
+
+
+def preload(names):
+    # Warm the remaining imports off the request path once the first page is out
+    def run():
+        for name in names:
+            lazy_import(name)
+
+    threading.Thread(target=run, name="preload-imports", daemon=True).start()
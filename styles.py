@@ -0,0 +1,121 @@
+"""Card styling shared by the Streamlit app and the offline bundle."""
+
+CARD_CSS = """
+    .stApp {
+        background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
+    }
+    
+    .flashcard {
+        background: white;
+        padding: 40px;
+        border-radius: 20px;
+        box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
+        text-align: center;
+        min-height: 300px;
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        margin: 20px 0;
+        transition: all 0.3s ease;
+        cursor: pointer;
+    }
+    
+    .flashcard:hover {
+        transform: translateY(-5px);
+        box-shadow: 0 15px 40px rgba(0, 0, 0, 0.15);
+    }
+    
+    .flashcard h2 {
+        color: #667eea;
+        margin-bottom: 20px;
+    }
+    
+    .flashcard p {
+        font-size: 1.2em;
+        line-height: 1.6;
+        color: #4a5568;
+    }
+    
+    .quiz-option {
+        background: #f7fafc;
+        padding: 15px 20px;
+        border-radius: 10px;
+        margin: 10px 0;
+        border: 2px solid transparent;
+        transition: all 0.3s ease;
+        cursor: pointer;
+    }
+    
+    .quiz-option:hover {
+        background: #e2e8f0;
+        transform: translateX(5px);
+    }
+    
+    .correct {
+        background: #c6f6d5 !important;
+        border-color: #48bb78 !important;
+    }
+    
+    .incorrect {
+        background: #fed7d7 !important;
+        border-color: #f56565 !important;
+    }
+    
+    .achievement {
+        background: white;
+        padding: 20px;
+        border-radius: 15px;
+        box-shadow: 0 5px 20px rgba(0, 0, 0, 0.1);
+        margin: 20px 0;
+        border-left: 4px solid #667eea;
+    }
+    
+    .memory-card {
+        background: linear-gradient(135deg, #667eea, #764ba2);
+        color: white;
+        padding: 20px;
+        border-radius: 15px;
+        text-align: center;
+        min-height: 120px;
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        cursor: pointer;
+        transition: all 0.3s ease;
+        font-weight: bold;
+    }
+    
+    .memory-card:hover {
+        transform: scale(1.05);
+    }
+    
+    .memory-card.flipped {
+        background: white;
+        color: #4a5568;
+        border: 2px solid #e2e8f0;
+    }
+    
+    .memory-card.matched {
+        background: #e2e8f0;
+        color: #718096;
+        cursor: default;
+        opacity: 0.7;
+    }
+    
+    .stProgress > div > div {
+        background-color: linear-gradient(135deg, #667eea, #764ba2);
+    }
+    
+    .stat-card {
+        background: white;
+        padding: 20px;
+        border-radius: 15px;
+        text-align: center;
+        box-shadow: 0 5px 15px rgba(0, 0, 0, 0.08);
+    }
+    
+    .stat-card h3 {
+        color: #667eea;
+        margin-bottom: 10px;
+    }
+"""
@@ -0,0 +1,76 @@
+"""Card HTML from precompiled templates: content escaped and rendered once per deck version."""
+import re
+from functools import lru_cache
+from html import escape
+from string import Formatter
+
+from styles import CARD_CSS
+
+FRAGMENT_CACHE_SIZE = 2048  # rendered cards per deck and kind
+
+
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", re.sub(r"\s+", " ", css))
+    return css.replace(";}", "}").strip()
+
+
+def compile_template(template):
+    """A render function for ``template`` that html-escapes every field it fills in."""
+    parts = [(literal, field) for literal, field, _, _ in Formatter().parse(template)]
+
+    def render(**fields):
+        return "".join(literal + ("" if field is None else escape(str(fields[field]))) for literal, field in parts)
+
+    return render
+
+
+# Built once per process; every full run sends it again, as Streamlit drops elements a run does not repeat
+STYLESHEET = f"<style>{minify_css(CARD_CSS)}</style>"
+
+flashcard_front = compile_template(
+    '<div class="flashcard"><div><h2>{question}</h2>'
+    '<p style="color: #718096; margin-top: 30px;">Klicke zum Umdrehen</p></div></div>'
+)
+flashcard_back = compile_template(
+    '<div class="flashcard"><div><h3 style="color: #667eea;">{question}</h3><p>{answer}</p></div></div>'
+)
+memory_card = compile_template('<div class="memory-card {state}">{text}</div>')
+_stat_card = compile_template('<div class="stat-card"><h3>{icon}</h3><h2>{value}</h2><p>{label}</p></div>')
+
+FOOTER = (
+    "<div style='text-align: center; color: #718096;'>"
+    "<p>💡 <strong>ADHS-Tipp</strong>: Mache alle 25 Minuten eine 5-Minuten-Pause (Pomodoro-Technik)</p>"
+    "<p>🎯 Setze dir kleine, erreichbare Ziele und feiere deine Erfolge!</p>"
+    "</div>"
+)
+
+
+@lru_cache(maxsize=256)
+def stat_card(icon, value, label):
+    return _stat_card(icon=icon, value=value, label=label)
+
+
+class CardTemplates:
+    """Rendered HTML of one deck version's cards, cached per card.
+
+    Keep one instance per deck version (e.g. ``DeckRegistry.derived``):
+    the fragments are never invalidated, a new deck version gets a new
+    instance.
+    """
+
+    def __init__(self, deck):
+        self._deck = deck
+        self.front = lru_cache(maxsize=FRAGMENT_CACHE_SIZE)(self._front)
+        self.back = lru_cache(maxsize=FRAGMENT_CACHE_SIZE)(self._back)
+        self.memory_card = lru_cache(maxsize=FRAGMENT_CACHE_SIZE)(self._memory_card)
+
+    def _front(self, card_id):
+        return flashcard_front(question=self._deck.flashcard(card_id)["question"])
+
+    def _back(self, card_id):
+        card = self._deck.flashcard(card_id)
+        return flashcard_back(question=card["question"], answer=card["answer"])
+
+    def _memory_card(self, pair_id, side, state):
+        return memory_card(state=state, text=self._deck.memory_pair(pair_id)[side])
@@ -0,0 +1,72 @@
+"""Time on task: active and idle time per learning item, buffered into batches."""
+from dataclasses import dataclass, field
+
+IDLE_AFTER = 2 * 60  # seconds without interaction after which the learner counts as idle
+FLUSH_INTERVAL = 60.0  # seconds a measurement may wait in the buffer
+BATCH_SIZE = 50  # measurements per flushed batch at most
+
+
+def format_duration(seconds):
+    hours, minutes = divmod(int(seconds // 60), 60)
+    return f"{hours} Std. {minutes} Min." if hours else f"{minutes} Minuten"
+
+
+@dataclass(slots=True)
+class TimeTracker:
+    """Splits the time between two interactions into active and idle time.
+
+    Up to ``IDLE_AFTER`` seconds of every gap count as active (reading a
+    card, thinking about an answer), the rest as idle. The time is booked
+    on the item in focus; when the focus moves on, the item's dwell time
+    becomes a measurement ``[kind, item_id, active, idle]``. Measurements
+    stay in memory until ``FLUSH_INTERVAL`` has passed or ``BATCH_SIZE``
+    are waiting, then ``focus`` hands them out as one batch. A session that
+    ends loses at most the unflushed rest.
+    """
+
+    active: float = 0.0  # totals over all sessions, in seconds
+    idle: float = 0.0
+    item: tuple = (None, None)  # (kind, item_id) in focus
+    item_active: float = 0.0
+    item_idle: float = 0.0
+    last_seen: float = None
+    pending: list = field(default_factory=list)
+    pending_since: float = None
+
+    def touch(self, now):
+        if self.last_seen is not None:
+            gap = max(0.0, now - self.last_seen)
+            active = min(gap, IDLE_AFTER)
+            self.active += active
+            self.idle += gap - active
+            self.item_active += active
+            self.item_idle += gap - active
+        self.last_seen = now
+
+    def focus(self, kind, item_id, now):
+        """Book the time since the last interaction, move the focus, and return a due batch or None."""
+        self.touch(now)
+        if (kind, item_id) != self.item:
+            if self.item[0] is not None and self.item_active + self.item_idle > 0:
+                if not self.pending:
+                    self.pending_since = now
+                self.pending.append([*self.item, round(self.item_active, 1), round(self.item_idle, 1)])
+            self.item = (kind, item_id)
+            self.item_active = self.item_idle = 0.0
+        if self.pending and (len(self.pending) >= BATCH_SIZE or now - self.pending_since >= FLUSH_INTERVAL):
+            batch, self.pending = self.pending, []
+            return batch
+        return None
+
+    def drain(self, now):
+        """Book the item in focus and return everything still buffered, e.g. before the session moves on."""
+        self.focus(None, None, now)
+        batch, self.pending = self.pending, []
+        return batch
+
+    def to_dict(self):
+        return {"active": round(self.active, 1), "idle": round(self.idle, 1)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(active=data["active"], idle=data["idle"])